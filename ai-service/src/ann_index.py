@@ -0,0 +1,72 @@
+import math
+
+import numpy as np
+
+from src.config import config
+
+# Rows scored per matrix product when assigning rows to lists
+_BLOCK_ROWS = 4096
+
+
+class IVFIndex:
+    """Inverted-file index over row-normalised embeddings.
+
+    Rows are clustered around spherical k-means centroids; a query only scores
+    the rows of its ``probes`` nearest lists. More probes trade latency for
+    recall. Appended rows are assigned to the existing lists, and the owner
+    retrains once the data has doubled since the centroids were fitted.
+    """
+
+    def __init__(self, rows: np.ndarray, n_lists: int) -> None:
+        self.centroids = _kmeans(rows, n_lists)
+        self.trained_rows = len(rows)
+        self._assignments = np.empty(0, dtype=np.int32)
+        self.add(rows)
+
+    @classmethod
+    def build(cls, rows: np.ndarray) -> "IVFIndex":
+        n_lists = config.retrieval.ann_lists or round(math.sqrt(len(rows)))
+        return cls(rows, max(1, min(n_lists, len(rows))))
+
+    def __len__(self) -> int:
+        return len(self._assignments)
+
+    @property
+    def stale(self) -> bool:
+        return len(self) >= 2 * self.trained_rows
+
+    def add(self, rows: np.ndarray) -> None:
+        self._assignments = np.concatenate([self._assignments, _assign(rows, self.centroids)])
+
+    def candidates(self, query: np.ndarray, probes: int) -> np.ndarray:
+        """Row ids in the ``probes`` lists closest to a normalised ``query``."""
+        n_lists = len(self.centroids)
+        if probes >= n_lists:
+            return np.arange(len(self))
+        nearest = np.argpartition(self.centroids @ query, -probes)[-probes:]
+        return np.flatnonzero(np.isin(self._assignments, nearest))
+
+
+def _assign(rows: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    out = np.empty(len(rows), dtype=np.int32)
+    for start in range(0, len(rows), _BLOCK_ROWS):
+        block = np.asarray(rows[start : start + _BLOCK_ROWS])
+        out[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return out
+
+
+def _kmeans(rows: np.ndarray, k: int, iterations: int = 8, sample_per_list: int = 64) -> np.ndarray:
+    """Spherical k-means on a sample of at most ``sample_per_list * k`` rows."""
+    rng = np.random.default_rng(0)
+    sample_size = min(len(rows), sample_per_list * k)
+    sample = np.asarray(rows[np.sort(rng.choice(len(rows), sample_size, replace=False))])
+    centroids = sample[rng.choice(sample_size, k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        # Empty lists keep their previous centroid
+        filled = norms[:, 0] > 0
+        centroids[filled] = sums[filled] / norms[filled]
+    return centroids
@@ -0,0 +1,92 @@
+import logging
+import re
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from src.context_builder import count_tokens, truncate_text
+from src.embedding_cache import embed_texts
+from src.ollama_client import OllamaError
+from src.scheduler import QueueFull
+
+logger = logging.getLogger(__name__)
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+
+@dataclass(slots=True)
+class SelectedAnswers:
+    # Answers included verbatim, in the order they were given
+    full: dict[str, str] = field(default_factory=dict)
+    # First sentence of answers that did not fit, within the summary budget
+    abridged: dict[str, str] = field(default_factory=dict)
+    tokens: int = 0
+    omitted: int = 0
+
+    def render(self) -> str:
+        lines = [f"- {k}: {v}" for k, v in self.full.items()] or ["None"]
+        if self.abridged:
+            lines.append("Other answers (abridged):")
+            lines.extend(f"- {k}: {v}" for k, v in self.abridged.items())
+        return "\n".join(lines)
+
+
+def answers_fit(answers: dict[str, str], budget_tokens: int) -> bool:
+    return sum(_cost(k, v) for k, v in answers.items()) <= budget_tokens
+
+
+async def select_previous_answers(
+    answers: dict[str, str],
+    query_embedding: np.ndarray | None,
+    budget_tokens: int,
+    summary_tokens: int = 0,
+) -> SelectedAnswers:
+    """Keep the previous answers most relevant to the question within a token budget.
+
+    Answers are ranked by cosine similarity to ``query_embedding``; their
+    embeddings go through the embedding cache, so each answer is embedded once
+    however many questions follow it. Without a query embedding the most
+    recent answers win. Answers that do not fit are abridged to their first
+    sentence within ``summary_tokens``.
+    """
+    items = [(k, v) for k, v in answers.items() if v and v.strip()]
+    if answers_fit(dict(items), budget_tokens):
+        return SelectedAnswers(full=dict(items), tokens=sum(_cost(k, v) for k, v in items))
+
+    order = list(range(len(items)))[::-1]
+    if query_embedding is not None:
+        try:
+            vectors = await embed_texts([v for _, v in items])
+            q = np.asarray(query_embedding, dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(q) or 1.0)
+            norms[norms == 0] = 1.0
+            order = list(np.argsort(vectors @ q / norms)[::-1])
+        except (OllamaError, QueueFull) as exc:
+            logger.warning("Answer embeddings unavailable, keeping the latest answers: %r", exc)
+
+    selected = SelectedAnswers()
+    chosen: set[int] = set()
+    for i in order:
+        cost = _cost(*items[i])
+        # An answer too long for what is left is skipped; shorter ones may still fit
+        if selected.tokens + cost > budget_tokens:
+            continue
+        chosen.add(int(i))
+        selected.tokens += cost
+    summary_used = 0
+    for i, (k, v) in enumerate(items):
+        if i in chosen:
+            selected.full[k] = v
+            continue
+        selected.omitted += 1
+        gist = truncate_text(_SENTENCE_END.split(v.strip(), maxsplit=1)[0], 40)
+        cost = _cost(k, gist)
+        if summary_used + cost <= summary_tokens:
+            selected.abridged[k] = gist
+            summary_used += cost
+    selected.tokens += summary_used
+    return selected
+
+
+def _cost(key: str, value: str) -> int:
+    return count_tokens(f"- {key}: {value}")
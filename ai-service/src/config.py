@@ -21,21 +21,116 @@ class _ModelConfig:
     embed_model: str = os.environ.get("OLLAMA_EMBED_MODEL", _raw["model"]["embed_model"])
     temperature: float = float(_raw["model"]["temperature"])
     max_tokens: int = int(_raw["model"]["max_tokens"])
+    num_ctx: int = int(_raw["model"]["num_ctx"])
+    keep_alive: str = os.environ.get("OLLAMA_KEEP_ALIVE", str(_raw["model"]["keep_alive"]))
+
+
+class _WarmupConfig:
+    enabled: bool = bool(_raw["warmup"]["enabled"])
+    interval_seconds: float = float(_raw["warmup"]["interval_seconds"])
+    retry_seconds: float = float(_raw["warmup"]["retry_seconds"])
+    ready_timeout_seconds: float = float(_raw["warmup"]["ready_timeout_seconds"])
+
+
+class _PromptConfig:
+    layout: str = _raw["prompt"]["layout"]
+    pinned_tokens: int = int(_raw["prompt"]["pinned_tokens"])
+    previous_answers_tokens: int = int(_raw["prompt"]["previous_answers_tokens"])
+    answer_summary_tokens: int = int(_raw["prompt"]["answer_summary_tokens"])
+
+
+class _SuggestConfig:
+    supersede: bool = bool(_raw["suggest"]["supersede"])
+    debounce_ms: int = int(_raw["suggest"]["debounce_ms"])
+    retrieval_only_wait_seconds: float = float(_raw["suggest"]["retrieval_only_wait_seconds"])
+    source_excerpt_chars: int = int(_raw["suggest"]["source_excerpt_chars"])
+
+
+class _HttpConfig:
+    max_connections: int = int(_raw["http"]["max_connections"])
+    max_keepalive_connections: int = int(_raw["http"]["max_keepalive_connections"])
+    keepalive_expiry: float = float(_raw["http"]["keepalive_expiry"])
+    connect_timeout: float = float(_raw["http"]["connect_timeout"])
+    embed_timeout: float = float(_raw["http"]["embed_timeout"])
+    chat_timeout: float = float(_raw["http"]["chat_timeout"])
+
+
+class _SchedulerConfig:
+    embed_slots: int = int(_raw["scheduler"]["embed_slots"])
+    generate_slots: int = int(_raw["scheduler"]["generate_slots"])
+    max_queue: int = int(_raw["scheduler"]["max_queue"])
+
+
+class _ParsingConfig:
+    workers: int = int(_raw["parsing"]["workers"])
+    pages_per_task: int = int(_raw["parsing"]["pages_per_task"])
+    max_pages: int = int(_raw["parsing"]["max_pages"])
+    timeout_seconds: float = float(_raw["parsing"]["timeout_seconds"])
+
+
+class _EmbeddingConfig:
+    batch_size: int = int(_raw["embedding"]["batch_size"])
+    concurrency: int = int(_raw["embedding"]["concurrency"])
+    max_retries: int = int(_raw["embedding"]["max_retries"])
+
+
+class _CacheConfig:
+    embedding_max_bytes: int = int(_raw["cache"]["embedding_max_bytes"])
+    embedding_disk_path: str | None = os.environ.get(
+        "EMBEDDING_CACHE_PATH", _raw["cache"]["embedding_disk_path"]
+    )
+    suggestion_max_entries: int = int(_raw["cache"]["suggestion_max_entries"])
+    suggestion_ttl_seconds: float = float(_raw["cache"]["suggestion_ttl_seconds"])
+    document_max_bytes: int = int(_raw["cache"]["document_max_bytes"])
+
+
+class _DedupConfig:
+    strip_boilerplate: bool = bool(_raw["dedup"]["strip_boilerplate"])
+    boilerplate_page_ratio: float = float(_raw["dedup"]["boilerplate_page_ratio"])
+    boilerplate_min_pages: int = int(_raw["dedup"]["boilerplate_min_pages"])
+    boilerplate_edge_lines: int = int(_raw["dedup"]["boilerplate_edge_lines"])
+    boilerplate_max_fraction: float = float(_raw["dedup"]["boilerplate_max_fraction"])
+    near_duplicate_threshold: float = float(_raw["dedup"]["near_duplicate_threshold"])
+    minhash_permutations: int = int(_raw["dedup"]["minhash_permutations"])
+    minhash_bands: int = int(_raw["dedup"]["minhash_bands"])
 
 
 class _RetrievalConfig:
     top_k: int = int(_raw["retrieval"]["top_k"])
+    mode: str = _raw["retrieval"]["mode"]
+    fusion_depth: int = int(_raw["retrieval"]["fusion_depth"])
+    embed_timeout_seconds: float = float(_raw["retrieval"]["embed_timeout_seconds"])
     context_tokens: int = int(_raw["retrieval"]["context_tokens"])
+    ann_min_rows: int = int(_raw["retrieval"]["ann_min_rows"])
+    ann_lists: int = int(_raw["retrieval"]["ann_lists"])
+    ann_probes: int = int(_raw["retrieval"]["ann_probes"])
 
 
 class _SessionConfig:
     ttl_seconds: int = int(_raw["session"]["ttl_seconds"])
+    max_bytes: int = int(os.environ.get("AI_SESSION_MAX_BYTES", _raw["session"]["max_bytes"]))
+    backend: str = os.environ.get("AI_SESSION_BACKEND", _raw["session"]["backend"])
+    data_dir: str = os.environ.get("AI_SESSION_DIR", _raw["session"]["data_dir"])
+
+
+class _AdminConfig:
+    token: str | None = os.environ.get("AI_ADMIN_TOKEN", _raw["admin"]["token"]) or None
 
 
 class Config:
     model = _ModelConfig()
+    warmup = _WarmupConfig()
+    prompt = _PromptConfig()
+    suggest = _SuggestConfig()
+    http = _HttpConfig()
+    scheduler = _SchedulerConfig()
+    parsing = _ParsingConfig()
+    embedding = _EmbeddingConfig()
+    cache = _CacheConfig()
+    dedup = _DedupConfig()
     retrieval = _RetrievalConfig()
     session = _SessionConfig()
+    admin = _AdminConfig()
 
 
 config = Config()
@@ -0,0 +1,97 @@
+import math
+import re
+from dataclasses import dataclass
+
+from src.document_pipeline import CHUNK_OVERLAP, RetrievedChunk
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+_SEPARATOR = "\n\n---\n\n"
+# Do not bother appending a truncated chunk smaller than this
+_MIN_TAIL_TOKENS = 32
+
+
+def count_tokens(text: str) -> int:
+    """Approximate the model's token count without loading its tokenizer.
+
+    Words are counted as one token per four characters (BPE vocabularies split
+    long words) and every punctuation mark as one token.
+    """
+    return sum(math.ceil(len(piece) / 4) for piece in _TOKEN_PATTERN.findall(text))
+
+
+@dataclass(slots=True)
+class AssembledContext:
+    text: str
+    tokens: int
+    chunks: list[RetrievedChunk]
+
+
+def assemble_context(
+    retrieved: list[RetrievedChunk],
+    budget_tokens: int,
+    overlap: int = CHUNK_OVERLAP,
+) -> AssembledContext:
+    """Pack the highest-scoring chunks into ``budget_tokens``.
+
+    When two neighbouring chunks are both selected, the words they share from
+    the chunker's sliding-window overlap are kept only once. The last chunk
+    that does not fit whole is truncated to the remaining budget.
+    """
+    selected: dict[int, list[str]] = {}
+    used: list[RetrievedChunk] = []
+    tokens = 0
+    separator_tokens = count_tokens(_SEPARATOR)
+
+    for chunk in retrieved:
+        words = chunk.text.split()
+        previous = selected.get(chunk.index - 1)
+        if previous is not None and _shares_overlap(previous, words, overlap):
+            words = words[overlap:]
+        following = selected.get(chunk.index + 1)
+        if following is not None and _shares_overlap(words, following, overlap):
+            words = words[:-overlap]
+        if not words:
+            continue
+
+        cost = count_tokens(" ".join(words)) + (separator_tokens if selected else 0)
+        if tokens + cost > budget_tokens:
+            remaining = budget_tokens - tokens - (separator_tokens if selected else 0)
+            if remaining < _MIN_TAIL_TOKENS:
+                break
+            words = _truncate(words, remaining)
+            cost = count_tokens(" ".join(words)) + (separator_tokens if selected else 0)
+            selected[chunk.index] = words
+            used.append(chunk)
+            tokens += cost
+            break
+
+        selected[chunk.index] = words
+        used.append(chunk)
+        tokens += cost
+
+    text = _SEPARATOR.join(" ".join(selected[c.index]) for c in used)
+    return AssembledContext(text=text, tokens=tokens, chunks=used)
+
+
+def truncate_text(text: str, budget_tokens: int) -> str:
+    """The leading words of ``text`` that fit in ``budget_tokens``."""
+    return " ".join(_truncate(text.split(), budget_tokens))
+
+
+def _shares_overlap(first: list[str], second: list[str], overlap: int) -> bool:
+    """Whether ``first`` ends with the ``overlap`` words ``second`` starts with."""
+    if overlap <= 0 or len(first) < overlap:
+        return False
+    return first[-overlap:] == second[:overlap]
+
+
+def _truncate(words: list[str], budget_tokens: int) -> list[str]:
+    kept: list[str] = []
+    tokens = 0
+    for word in words:
+        cost = count_tokens(word)
+        if tokens + cost > budget_tokens:
+            break
+        kept.append(word)
+        tokens += cost
+    return kept
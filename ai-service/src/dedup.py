@@ -0,0 +1,198 @@
+import re
+import sys
+import zlib
+from collections import Counter
+
+import numpy as np
+
+from src.config import config
+from src.embedding_cache import text_hash
+
+# Separates pages in parser output; plain whitespace to the chunker
+PAGE_BREAK = "\f"
+# Bump when boilerplate or near-duplicate detection changes, to invalidate the document cache
+DEDUP_VERSION = 2
+
+_DIGITS_RE = re.compile(r"\d+")
+# Mersenne prime for the universal hash family (a * x + b) mod p
+_PRIME = (1 << 61) - 1
+_SHINGLE_WORDS = 5
+# Headers and footers are short; longer repeated lines are kept as content
+_MAX_BOILERPLATE_WORDS = 20
+# Shorter lines (a lone word, a page number) are never treated as boilerplate
+_MIN_BOILERPLATE_CHARS = 8
+# A line must repeat on at least this many pages, however few the document has
+_MIN_REPEAT_PAGES = 3
+# Below this many words per line the parser lost the line structure
+# (e.g. one word per line), so headers cannot be told apart from body text
+_MIN_WORDS_PER_LINE = 2.5
+# Approximate cost of one hash-table slot, of one list entry and of an int object
+_SLOT_BYTES = 24
+_ENTRY_BYTES = 8
+_INT_BYTES = 28
+
+
+def strip_boilerplate(text: str) -> tuple[str, int]:
+    """Remove lines repeated across pages, such as running headers and footers.
+
+    Only the first and last ``dedup.boilerplate_edge_lines`` lines of each page
+    are candidates. A candidate counts as boilerplate when, with digits masked
+    (so "Page 3 of 40" matches on every page), it appears on at least
+    ``dedup.boilerplate_page_ratio`` of the pages. Nothing is removed when the
+    pages have no real line structure or when the lines found would take more
+    than ``dedup.boilerplate_max_fraction`` of the words. Returns the cleaned
+    text and the number of lines removed.
+    """
+    pages = text.split(PAGE_BREAK)
+    if not config.dedup.strip_boilerplate or len(pages) < config.dedup.boilerplate_min_pages:
+        return text, 0
+    page_lines = [page.splitlines() for page in pages]
+    lines = [line for page in page_lines for line in page if line.strip()]
+    total_words = sum(len(line.split()) for line in lines)
+    if not lines or total_words / len(lines) < _MIN_WORDS_PER_LINE:
+        return text, 0
+    seen = Counter(key for page in page_lines for key in _edge_keys(page))
+    threshold = max(_MIN_REPEAT_PAGES, config.dedup.boilerplate_page_ratio * len(pages))
+    repeated = {key for key, count in seen.items() if count >= threshold}
+    if not repeated:
+        return text, 0
+    removed = removed_words = 0
+    kept_pages = []
+    for page in page_lines:
+        edges = _edge_indices(page)
+        kept = []
+        for i, line in enumerate(page):
+            if i in edges and _line_key(line) in repeated:
+                removed += 1
+                removed_words += len(line.split())
+            else:
+                kept.append(line)
+        kept_pages.append("\n".join(kept))
+    if removed_words > config.dedup.boilerplate_max_fraction * total_words:
+        return text, 0
+    return PAGE_BREAK.join(kept_pages), removed
+
+
+def _edge_indices(page: list[str]) -> set[int]:
+    """Indices of the first and last few non-empty lines of a page."""
+    filled = [i for i, line in enumerate(page) if line.strip()]
+    n = config.dedup.boilerplate_edge_lines
+    return set(filled[:n] + filled[-n:])
+
+
+def _edge_keys(page: list[str]) -> set[str]:
+    keys = {_line_key(page[i]) for i in _edge_indices(page)}
+    keys.discard("")
+    return keys
+
+
+def _line_key(line: str) -> str:
+    words = line.split()
+    if len(words) > _MAX_BOILERPLATE_WORDS or len("".join(words)) < _MIN_BOILERPLATE_CHARS:
+        return ""
+    return _DIGITS_RE.sub("#", " ".join(words).lower())
+
+
+class ChunkDeduper:
+    """Exact and near-duplicate detection over the chunks of one session.
+
+    Exact duplicates are caught by content hash; near duplicates by MinHash
+    signatures over word shingles, bucketed with LSH bands so a lookup only
+    compares against chunks that share at least one band. ``nbytes`` tracks
+    the index size for the session memory budget.
+    """
+
+    def __init__(self) -> None:
+        self._hashes: set[str] = set()
+        self._signatures: list[np.ndarray] = []
+        self._buckets: dict[tuple[int, bytes], list[int]] = {}
+        # Signatures of the chunks the last ``filter`` kept, reused by ``add``
+        self._pending: dict[str, np.ndarray] = {}
+        self.nbytes = 0
+
+    def add(self, chunks: list[str]) -> None:
+        for text in chunks:
+            signature = self._pending.pop(text, None)
+            self._add(text, _signature(text) if signature is None else signature)
+
+    def filter(self, chunks: list[str]) -> tuple[list[str], int, int]:
+        """Drop chunks already in the session or earlier in ``chunks``.
+
+        Returns ``(kept, exact duplicates, near duplicates)``; nothing is added
+        to the session's index until the kept chunks are attached.
+        """
+        batch = ChunkDeduper()
+        kept: list[str] = []
+        exact = near = 0
+        for text in chunks:
+            digest = text_hash(text)
+            if digest in self._hashes or digest in batch._hashes:
+                exact += 1
+                continue
+            signature = _signature(text)
+            if self._is_near(signature) or batch._is_near(signature):
+                near += 1
+                continue
+            batch._add(text, signature)
+            kept.append(text)
+        self._pending = dict(zip(kept, batch._signatures))
+        return kept, exact, near
+
+    def _add(self, text: str, signature: np.ndarray) -> None:
+        digest = text_hash(text)
+        self._hashes.add(digest)
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        self.nbytes += (
+            sys.getsizeof(digest) + sys.getsizeof(signature) + 2 * _SLOT_BYTES + _INT_BYTES
+        )
+        for band in _bands(signature):
+            bucket = self._buckets.get(band)
+            if bucket is None:
+                bucket = self._buckets[band] = []
+                self.nbytes += (
+                    sys.getsizeof(band) + sys.getsizeof(band[1]) + sys.getsizeof(bucket) + _SLOT_BYTES
+                )
+            bucket.append(index)
+            self.nbytes += _ENTRY_BYTES
+
+    def _is_near(self, signature: np.ndarray) -> bool:
+        threshold = config.dedup.near_duplicate_threshold
+        if threshold <= 0:
+            return False
+        candidates = {i for band in _bands(signature) for i in self._buckets.get(band, ())}
+        return any(
+            np.mean(self._signatures[i] == signature) >= threshold for i in candidates
+        )
+
+
+def _permutations() -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(0)
+    n = config.dedup.minhash_permutations
+    a = rng.integers(1, _PRIME, n, dtype=np.uint64)
+    b = rng.integers(0, _PRIME, n, dtype=np.uint64)
+    return a, b
+
+
+_A, _B = _permutations()
+
+
+def _signature(text: str) -> np.ndarray:
+    words = text.lower().split()
+    shingles = {
+        " ".join(words[i : i + _SHINGLE_WORDS])
+        for i in range(max(1, len(words) - _SHINGLE_WORDS + 1))
+    }
+    hashes = np.fromiter(
+        (zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles)
+    )
+    # uint64 arithmetic wraps instead of overflowing; fine for a hash family
+    return ((hashes[:, None] * _A + _B) % _PRIME).min(axis=0)
+
+
+def _bands(signature: np.ndarray) -> list[tuple[int, bytes]]:
+    rows = max(1, len(signature) // config.dedup.minhash_bands)
+    return [
+        (band, signature[start : start + rows].tobytes())
+        for band, start in enumerate(range(0, len(signature), rows))
+    ]
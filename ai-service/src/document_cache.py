@@ -0,0 +1,139 @@
+import hashlib
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from src.config import config
+from src.dedup import DEDUP_VERSION
+from src.document_pipeline import CHUNK_OVERLAP, CHUNK_WORDS, CHUNKER_VERSION, PARSER_VERSION
+
+
+def pipeline_version() -> str:
+    """Everything besides the file bytes that shapes cached chunks and vectors."""
+    return ":".join(
+        [
+            f"parser{PARSER_VERSION}",
+            f"chunker{CHUNKER_VERSION}-{CHUNK_WORDS}-{CHUNK_OVERLAP}",
+            _dedup_version(),
+            config.model.embed_model,
+        ]
+    )
+
+
+def _dedup_version() -> str:
+    dedup = config.dedup
+    boilerplate = (
+        f"{dedup.boilerplate_page_ratio:g}-{dedup.boilerplate_min_pages}-"
+        f"{dedup.boilerplate_edge_lines}-{dedup.boilerplate_max_fraction:g}"
+        if dedup.strip_boilerplate
+        else "0"
+    )
+    return (
+        f"dedup{DEDUP_VERSION}-{boilerplate}-{dedup.near_duplicate_threshold:g}-"
+        f"{dedup.minhash_permutations}-{dedup.minhash_bands}"
+    )
+
+
+@dataclass(slots=True)
+class CachedDocument:
+    sha256: str
+    version: str
+    filename: str
+    chunks: list[str]
+    embeddings: np.ndarray
+    summary: str
+    boilerplate_lines: int = 0
+    created_at: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.time)
+    hits: int = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.embeddings.nbytes + sum(sys.getsizeof(c) for c in self.chunks)
+
+    def info(self) -> dict:
+        return {
+            "sha256": self.sha256,
+            "version": self.version,
+            "filename": self.filename,
+            "chunks": len(self.chunks),
+            "bytes": self.nbytes,
+            "hits": self.hits,
+            "created_at": self.created_at,
+            "last_used": self.last_used,
+        }
+
+
+class DocumentCache:
+    """Parsed and embedded uploads keyed by ``(sha256(file bytes), pipeline version)``.
+
+    A repeat upload of the same file attaches the cached chunks and vectors to
+    the session without parsing or embedding. Entries are evicted LRU-first
+    once ``cache.document_max_bytes`` is exceeded.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self._max_bytes = max_bytes
+        self._entries: OrderedDict[tuple[str, str], CachedDocument] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(content: bytes) -> tuple[str, str]:
+        return hashlib.sha256(content).hexdigest(), pipeline_version()
+
+    def get(self, key: tuple[str, str]) -> CachedDocument | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        entry.hits += 1
+        entry.last_used = time.time()
+        self.hits += 1
+        return entry
+
+    def put(self, entry: CachedDocument) -> None:
+        key = (entry.sha256, entry.version)
+        self._discard(key)
+        if entry.nbytes > self._max_bytes:
+            return
+        self._entries[key] = entry
+        self._bytes += entry.nbytes
+        while self._bytes > self._max_bytes:
+            oldest = next(iter(self._entries))
+            self._discard(oldest)
+            self.evictions += 1
+
+    def list(self) -> list[dict]:
+        return [entry.info() for entry in reversed(self._entries.values())]
+
+    def purge(self, sha256: str | None = None) -> int:
+        """Drop every version of one document, or everything without ``sha256``."""
+        keys = [k for k in self._entries if sha256 is None or k[0] == sha256]
+        for key in keys:
+            self._discard(key)
+        return len(keys)
+
+    def stats(self) -> dict:
+        return {
+            "documents": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self._max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _discard(self, key: tuple[str, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.nbytes
+
+
+document_cache = DocumentCache(max_bytes=config.cache.document_max_bytes)
@@ -1,8 +1,21 @@
 import io
+from dataclasses import dataclass
 from pathlib import Path
 
 import numpy as np
 
+from src.ann_index import IVFIndex
+from src.config import config
+from src.lexical_index import BM25Index
+
+CHUNK_WORDS = 400
+CHUNK_OVERLAP = 50
+# Bump when parse or chunk output changes, to invalidate the document cache
+PARSER_VERSION = 1
+CHUNKER_VERSION = 1
+# Reciprocal rank fusion damping constant; keeps one top rank from dominating
+_RRF_K = 60
+
 
 def parse_document(content: bytes, filename: str) -> str:
     suffix = Path(filename).suffix.lower()
@@ -20,13 +33,25 @@ def _parse_pdf(content: bytes) -> str:
     return "\n".join(page.extract_text() or "" for page in reader.pages)
 
 
+def pdf_page_count(content: bytes) -> int:
+    from pypdf import PdfReader
+    return len(PdfReader(io.BytesIO(content)).pages)
+
+
+def parse_pdf_pages(content: bytes, start: int, end: int) -> list[str]:
+    """Extract the text of pages ``[start, end)``; runs inside parser workers."""
+    from pypdf import PdfReader
+    reader = PdfReader(io.BytesIO(content))
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
 def _parse_docx(content: bytes) -> str:
     from docx import Document
     doc = Document(io.BytesIO(content))
     return "\n".join(p.text for p in doc.paragraphs if p.text.strip())
 
 
-def chunk_text(text: str, max_words: int = 400, overlap: int = 50) -> list[str]:
+def chunk_text(text: str, max_words: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP) -> list[str]:
     words = text.split()
     if not words:
         return []
@@ -41,22 +66,149 @@ def chunk_text(text: str, max_words: int = 400, overlap: int = 50) -> list[str]:
     return chunks
 
 
-def cosine_similarity(a: list[float], b: list[float]) -> float:
-    va, vb = np.array(a), np.array(b)
-    denom = np.linalg.norm(va) * np.linalg.norm(vb)
-    if denom == 0:
-        return 0.0
-    return float(np.dot(va, vb) / denom)
+class EmbeddingMatrix:
+    """Row-normalised float32 embeddings stored in one contiguous matrix.
+
+    Capacity grows geometrically so appending documents is amortised O(rows),
+    and similarity search is a single matrix-vector product. From
+    ``retrieval.ann_min_rows`` rows on, search goes through an IVF index that
+    is kept up to date as rows are appended.
+    """
+
+    _MIN_CAPACITY = 64
+
+    def __init__(self) -> None:
+        self._data = np.empty((0, 0), dtype=np.float32)
+        self._size = 0
+        self._index: IVFIndex | None = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    @classmethod
+    def wrap(cls, rows: np.ndarray) -> "EmbeddingMatrix":
+        """Use already-normalised ``rows`` (e.g. a read-only memmap) without copying.
+
+        The first ``append`` moves the rows into a growable in-memory buffer.
+        """
+        matrix = cls()
+        matrix._data = rows
+        matrix._size = len(rows)
+        return matrix
+
+    @property
+    def dim(self) -> int:
+        return self._data.shape[1]
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self._data[: self._size]
+
+    @property
+    def nbytes(self) -> int:
+        return self._data.nbytes
+
+    def append(self, vectors: list[list[float]] | np.ndarray) -> None:
+        rows = _normalize(np.asarray(vectors, dtype=np.float32))
+        if rows.size == 0:
+            return
+        if rows.ndim != 2:
+            raise ValueError("Embeddings must be a 2-D array")
+        if self._size and rows.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {rows.shape[1]} does not match {self.dim}")
+        needed = self._size + len(rows)
+        if needed > len(self._data):
+            capacity = max(self._MIN_CAPACITY, len(self._data))
+            while capacity < needed:
+                capacity *= 2
+            grown = np.empty((capacity, rows.shape[1]), dtype=np.float32)
+            if self._size:
+                grown[: self._size] = self._data[: self._size]
+            self._data = grown
+        self._data[self._size : needed] = rows
+        self._size = needed
+        if self._index is not None:
+            self._index.add(rows)
+
+    def search(self, query: list[float] | np.ndarray, top_k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Return ``(indices, scores)`` of the ``top_k`` most similar rows, best first."""
+        if self._size == 0 or top_k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+        q = _normalize(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        index = self._ann_index()
+        if index is not None:
+            rows = index.candidates(q, config.retrieval.ann_probes)
+            if len(rows) >= top_k:
+                return _top_k(rows, self._data[rows] @ q, top_k)
+        return _top_k(np.arange(self._size), self.matrix @ q, top_k)
+
+    def _ann_index(self) -> IVFIndex | None:
+        threshold = config.retrieval.ann_min_rows
+        if threshold <= 0 or self._size < threshold:
+            return None
+        if self._index is None or self._index.stale:
+            self._index = IVFIndex.build(self.matrix)
+        return self._index
+
+
+def _top_k(rows: np.ndarray, scores: np.ndarray, top_k: int) -> tuple[np.ndarray, np.ndarray]:
+    k = min(top_k, len(rows))
+    if k < len(rows):
+        best = np.argpartition(scores, -k)[-k:]
+    else:
+        best = np.arange(len(rows))
+    best = best[np.argsort(scores[best])[::-1]]
+    return rows[best], scores[best]
+
+
+def _normalize(rows: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(rows, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return rows / norms
+
+
+@dataclass(slots=True)
+class RetrievedChunk:
+    index: int
+    text: str
+    score: float
 
 
 def retrieve(
     query_embedding: list[float],
-    chunk_embeddings: list[list[float]],
+    chunk_embeddings: EmbeddingMatrix,
+    chunks: list[str],
+    top_k: int,
+) -> list[RetrievedChunk]:
+    """Return the ``top_k`` chunks most similar to the query, best first."""
+    if not chunks:
+        return []
+    indices, scores = chunk_embeddings.search(query_embedding, top_k)
+    return [RetrievedChunk(int(i), chunks[i], float(s)) for i, s in zip(indices, scores)]
+
+
+def retrieve_hybrid(
+    query: str,
+    query_embedding: list[float] | np.ndarray | None,
+    chunk_embeddings: EmbeddingMatrix,
+    lexical: BM25Index,
     chunks: list[str],
     top_k: int,
-) -> list[str]:
+) -> list[RetrievedChunk]:
+    """Fuse vector and BM25 rankings with reciprocal rank fusion, best first.
+
+    Without a ``query_embedding`` only the lexical ranking is used, so
+    retrieval still works when the embedding service is unavailable.
+    """
     if not chunks:
         return []
-    scores = [cosine_similarity(query_embedding, e) for e in chunk_embeddings]
-    ranked = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
-    return [chunks[i] for i in ranked[:top_k]]
+    depth = max(top_k, config.retrieval.fusion_depth)
+    rankings = [lexical.search(query, depth)[0]]
+    if query_embedding is not None:
+        rankings.append(chunk_embeddings.search(query_embedding, depth)[0])
+    fused: dict[int, float] = {}
+    for ranking in rankings:
+        for rank, index in enumerate(ranking):
+            fused[int(index)] = fused.get(int(index), 0.0) + 1.0 / (_RRF_K + rank + 1)
+    best = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+    return [RetrievedChunk(i, chunks[i], score) for i, score in best]
@@ -0,0 +1,159 @@
+import hashlib
+import sqlite3
+from collections import OrderedDict
+
+import numpy as np
+
+from src.config import config
+from src.ollama_client import ollama
+
+CacheKey = tuple[str, str]
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Content-addressed embedding cache shared by every session.
+
+    Entries are keyed by ``(embed model, sha256(text))``. A byte-bounded LRU
+    lives in memory; when a SQLite path is configured, entries are also written
+    to disk so they survive restarts and are promoted back on a memory miss.
+    """
+
+    def __init__(self, max_bytes: int, disk_path: str | None = None) -> None:
+        self._max_bytes = max_bytes
+        self._disk_path = disk_path
+        self._db: sqlite3.Connection | None = None
+        self._entries: OrderedDict[CacheKey, np.ndarray] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get_many(self, model: str, texts: list[str]) -> list[np.ndarray | None]:
+        keys = [(model, text_hash(t)) for t in texts]
+        found: list[np.ndarray | None] = [None] * len(keys)
+        disk_lookup: list[int] = []
+        for i, key in enumerate(keys):
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                found[i] = vector
+                self.hits += 1
+            else:
+                disk_lookup.append(i)
+
+        if disk_lookup and self._connect() is not None:
+            stored = self._disk_get([keys[i] for i in disk_lookup])
+            for i in disk_lookup:
+                vector = stored.get(keys[i])
+                if vector is not None:
+                    found[i] = vector
+                    self._remember(keys[i], vector)
+                    self.disk_hits += 1
+
+        self.misses += sum(1 for v in found if v is None)
+        return found
+
+    def put_many(self, model: str, texts: list[str], vectors: list[np.ndarray]) -> None:
+        keys = [(model, text_hash(t)) for t in texts]
+        rows = [np.array(v, dtype=np.float32) for v in vectors]
+        for key, vector in zip(keys, rows):
+            self._remember(key, vector)
+        db = self._connect()
+        if db is not None:
+            db.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, hash, vector) VALUES (?, ?, ?)",
+                [(m, h, v.tobytes()) for (m, h), v in zip(keys, rows)],
+            )
+            db.commit()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self._max_bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "disk_path": self._disk_path,
+        }
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _remember(self, key: CacheKey, vector: np.ndarray) -> None:
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous.nbytes
+        if vector.nbytes > self._max_bytes:
+            return
+        self._entries[key] = vector
+        self._bytes += vector.nbytes
+        while self._bytes > self._max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    def _connect(self) -> sqlite3.Connection | None:
+        if self._disk_path is None:
+            return None
+        if self._db is None:
+            self._db = sqlite3.connect(self._disk_path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, hash TEXT NOT NULL, vector BLOB NOT NULL, "
+                "PRIMARY KEY (model, hash))"
+            )
+        return self._db
+
+    def _disk_get(self, keys: list[CacheKey]) -> dict[CacheKey, np.ndarray]:
+        stored: dict[CacheKey, np.ndarray] = {}
+        by_model: dict[str, list[str]] = {}
+        for model, digest in keys:
+            by_model.setdefault(model, []).append(digest)
+        for model, digests in by_model.items():
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(digests), 500):
+                part = digests[start : start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._db.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({placeholders})",
+                    [model, *part],
+                )
+                for digest, blob in rows:
+                    stored[(model, digest)] = np.frombuffer(blob, dtype=np.float32)
+        return stored
+
+
+async def embed_texts(texts: list[str]) -> np.ndarray:
+    """Embed ``texts`` through the cache, sending only misses to Ollama."""
+    model = config.model.embed_model
+    vectors = embedding_cache.get_many(model, texts)
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    if missing:
+        # Identical chunks within one upload are embedded once
+        unique = list(dict.fromkeys(texts[i] for i in missing))
+        fresh = np.asarray(await ollama.embed_batch(unique), dtype=np.float32)
+        embedding_cache.put_many(model, unique, list(fresh))
+        by_text = dict(zip(unique, fresh))
+        for i in missing:
+            vectors[i] = by_text[texts[i]]
+    if not vectors:
+        return np.empty((0, 0), dtype=np.float32)
+    return np.stack(vectors)
+
+
+async def embed_text(text: str) -> np.ndarray:
+    return (await embed_texts([text]))[0]
+
+
+embedding_cache = EmbeddingCache(
+    max_bytes=config.cache.embedding_max_bytes,
+    disk_path=config.cache.embedding_disk_path,
+)
@@ -0,0 +1,154 @@
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from src.config import config
+from src.context_builder import truncate_text
+from src.dedup import ChunkDeduper, strip_boilerplate
+from src.document_cache import CachedDocument, document_cache
+from src.document_pipeline import chunk_text
+from src.embedding_cache import embed_texts, embedding_cache
+from src.jobs import BackgroundJob, JobRegistry
+from src.ollama_client import OllamaError
+from src.parser_pool import DocumentTooLarge, parser_pool
+from src.scheduler import BULK, set_caller
+from src.session_store import Session, session_store
+
+
+class IngestionError(Exception):
+    pass
+
+
+@dataclass(slots=True)
+class IngestionJob(BackgroundJob):
+    filename: str = "document"
+    pages_total: int | None = None
+    pages_parsed: int = 0
+    chunks_total: int | None = None
+    chunks_embedded: int = 0
+    boilerplate_lines: int = 0
+    # Chunks skipped as exact or near duplicates — one embed input saved each
+    duplicates_exact: int = 0
+    duplicates_near: int = 0
+    # Chunks and vectors came from the document cache
+    cache_hit: bool = False
+    embedding_started_at: float | None = None
+
+    def eta_seconds(self) -> float | None:
+        if self.finished or not self.chunks_total or not self.chunks_embedded:
+            return None
+        elapsed = time.time() - (self.embedding_started_at or self.created_at)
+        remaining = self.chunks_total - self.chunks_embedded
+        return round(elapsed / self.chunks_embedded * remaining, 1)
+
+    def snapshot(self) -> dict:
+        return {
+            **BackgroundJob.snapshot(self),
+            "filename": self.filename,
+            "pages_total": self.pages_total,
+            "pages_parsed": self.pages_parsed,
+            "chunks_total": self.chunks_total,
+            "chunks_embedded": self.chunks_embedded,
+            "boilerplate_lines": self.boilerplate_lines,
+            "duplicates_exact": self.duplicates_exact,
+            "duplicates_near": self.duplicates_near,
+            "embeds_saved": self.duplicates_exact + self.duplicates_near,
+            "cache_hit": self.cache_hit,
+            "eta_seconds": self.eta_seconds(),
+        }
+
+
+class IngestionJobs(JobRegistry[IngestionJob]):
+    def start_ingestion(self, session: Session, content: bytes, filename: str) -> IngestionJob:
+        job = IngestionJob(id=self.new_id(), session_id=session.id, filename=filename)
+        return self.start(job, _ingest(job, session, content))
+
+    def stats(self) -> dict:
+        jobs = self._jobs.values()
+        return {
+            **super().stats(),
+            "boilerplate_lines": sum(j.boilerplate_lines for j in jobs),
+            "embeds_saved": sum(j.duplicates_exact + j.duplicates_near for j in jobs),
+        }
+
+
+async def _ingest(job: IngestionJob, session: Session, content: bytes) -> None:
+    set_caller(session.id, BULK)
+    key = document_cache.key(content)
+    cached = document_cache.get(key)
+    if cached is not None:
+        job.update(cache_hit=True, boilerplate_lines=cached.boilerplate_lines)
+        _attach_cached(job, session, cached)
+        return
+
+    job.update(status="parsing")
+    try:
+        text = await parser_pool.parse(
+            content,
+            job.filename,
+            on_progress=lambda parsed, total: job.update(pages_parsed=parsed, pages_total=total),
+        )
+    except DocumentTooLarge:
+        raise
+    except Exception as exc:
+        raise IngestionError(f"Could not parse document: {exc}") from exc
+    text, boilerplate_lines = strip_boilerplate(text)
+    # Duplicates within the document first, so the cached copy is already clean
+    document_chunks, exact, near = ChunkDeduper().filter(chunk_text(text))
+    if not document_chunks:
+        raise IngestionError("Document appears to be empty")
+    summary = truncate_text(text, config.prompt.pinned_tokens)
+    chunks, session_exact, session_near = session.dedup.filter(document_chunks)
+    job.update(
+        boilerplate_lines=boilerplate_lines,
+        duplicates_exact=exact + session_exact,
+        duplicates_near=near + session_near,
+    )
+
+    job.update(status="embedding", chunks_total=len(chunks), embedding_started_at=time.time())
+    # Attach each window as soon as it is embedded so suggest can use it
+    window = config.embedding.batch_size * config.embedding.concurrency
+    embedded: dict[str, np.ndarray] = {}
+    for start in range(0, len(chunks), window):
+        part = chunks[start : start + window]
+        try:
+            vectors = await embed_texts(part)
+        except OllamaError as exc:
+            raise IngestionError(f"Embedding failed: {exc}") from exc
+        if not session_store.add_document(session, part, vectors, summary):
+            raise IngestionError("Session not found or expired")
+        embedded.update(zip(part, vectors))
+        job.update(chunks_embedded=start + len(part))
+
+    # Chunks the session already had are usually in the embedding cache; a
+    # skipped near duplicate may not be, and then the document is not cached
+    missing = [c for c in document_chunks if c not in embedded]
+    if missing:
+        embedded.update(zip(missing, embedding_cache.get_many(config.model.embed_model, missing)))
+    vectors = [embedded[c] for c in document_chunks]
+    if all(v is not None for v in vectors):
+        document_cache.put(
+            CachedDocument(
+                sha256=key[0],
+                version=key[1],
+                filename=job.filename,
+                chunks=document_chunks,
+                embeddings=np.stack(vectors),
+                summary=summary,
+                boilerplate_lines=boilerplate_lines,
+            )
+        )
+
+
+def _attach_cached(job: IngestionJob, session: Session, cached: CachedDocument) -> None:
+    chunks, exact, near = session.dedup.filter(cached.chunks)
+    rows = {text: i for i, text in enumerate(cached.chunks)}
+    vectors = cached.embeddings[[rows[text] for text in chunks]]
+    job.update(duplicates_exact=exact, duplicates_near=near, chunks_total=len(chunks))
+    if not session_store.add_document(session, chunks, vectors, cached.summary):
+        raise IngestionError("Session not found or expired")
+    job.update(chunks_embedded=len(chunks))
+
+
+ingestion_jobs = IngestionJobs("ingestion")
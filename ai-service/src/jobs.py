@@ -0,0 +1,205 @@
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Coroutine, Generic, TypeVar
+
+from src.session_store import session_store
+
+TERMINAL_STATUSES = ("done", "failed")
+# Running jobs republish their snapshot at least this often to other workers
+_HEARTBEAT_SECONDS = 10.0
+# A running job not republished for this long belongs to a worker that stopped
+_STALE_SECONDS = 3 * _HEARTBEAT_SECONDS
+# How often a job running on another worker is re-read, and how often it is written
+_POLL_SECONDS = 0.5
+
+
+@dataclass(slots=True)
+class BackgroundJob:
+    id: str
+    session_id: str
+    status: str = "queued"
+    error: str | None = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: float | None = None
+    task: asyncio.Task | None = None
+    changed: asyncio.Event = field(default_factory=asyncio.Event)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def snapshot(self) -> dict:
+        return {
+            "job_id": self.id,
+            "session_id": self.session_id,
+            "status": self.status,
+            "error": self.error,
+        }
+
+    def update(self, **changes) -> None:
+        for name, value in changes.items():
+            setattr(self, name, value)
+        if self.finished and self.finished_at is None:
+            self.finished_at = time.time()
+        # Wake every subscriber, then arm a fresh event for the next change
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    async def updates(self) -> AsyncIterator[dict]:
+        """Yield a snapshot now and after every change until the job finishes."""
+        while True:
+            changed = self.changed
+            yield self.snapshot()
+            if self.finished:
+                return
+            await changed.wait()
+
+
+class StoredJob:
+    """Read-only view of a job running on another worker.
+
+    Fields come from the snapshot that worker last published through the
+    session backend; ``updates`` polls for newer ones.
+    """
+
+    def __init__(self, kind: str, snapshot: dict, updated_at: float) -> None:
+        self._kind = kind
+        self._load(snapshot, updated_at)
+
+    def __getattr__(self, name: str):
+        try:
+            return self._snapshot[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    @property
+    def id(self) -> str:
+        return self._snapshot["job_id"]
+
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def snapshot(self) -> dict:
+        return self._snapshot
+
+    async def updates(self) -> AsyncIterator[dict]:
+        while True:
+            yield self._snapshot
+            if self.finished:
+                return
+            await asyncio.sleep(_POLL_SECONDS)
+            stored = session_store.backend.load_job(self._kind, self.id)
+            if stored is None:
+                self._snapshot = {**self._snapshot, "status": "failed", "error": "Job no longer exists"}
+            else:
+                self._load(*stored)
+
+    def _load(self, snapshot: dict, updated_at: float) -> None:
+        if snapshot["status"] not in TERMINAL_STATUSES and time.time() - updated_at > _STALE_SECONDS:
+            snapshot = {**snapshot, "status": "failed", "error": "The worker running this job stopped"}
+        self._snapshot = snapshot
+
+
+J = TypeVar("J", bound=BackgroundJob)
+
+
+class JobRegistry(Generic[J]):
+    """Background jobs per session, kept for a while after they finish.
+
+    With a persistent session backend each job's snapshot is also published
+    there, so any worker can answer status and event requests for it.
+    """
+
+    def __init__(self, kind: str, retention_seconds: float = 3600) -> None:
+        self._kind = kind
+        self._jobs: dict[str, J] = {}
+        # Work of jobs whose task has not started running yet
+        self._unstarted: dict[str, Coroutine] = {}
+        self._retention_seconds = retention_seconds
+
+    @staticmethod
+    def new_id() -> str:
+        return str(uuid.uuid4())
+
+    def start(self, job: J, work: Coroutine) -> J:
+        self._prune()
+        self._jobs[job.id] = job
+        self._unstarted[job.id] = work
+        job.task = asyncio.create_task(self._run(job, work))
+        return job
+
+    def get(self, session_id: str, job_id: str) -> J | StoredJob | None:
+        job = self._jobs.get(job_id)
+        if job is None:
+            stored = session_store.backend.load_job(self._kind, job_id)
+            if stored is None:
+                return None
+            job = StoredJob(self._kind, *stored)
+        if job.session_id != session_id:
+            return None
+        return job
+
+    def cancel_session(self, session_id: str) -> None:
+        for job in list(self._jobs.values()):
+            if job.session_id == session_id:
+                self._cancel(job)
+                del self._jobs[job.id]
+
+    async def shutdown(self) -> None:
+        tasks = [j.task for j in self._jobs.values() if j.task is not None and not j.task.done()]
+        for job in list(self._jobs.values()):
+            self._cancel(job)
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        running = sum(1 for j in self._jobs.values() if not j.finished)
+        return {"jobs": len(self._jobs), "running": running}
+
+    def _cancel(self, job: J) -> None:
+        if job.task is None or job.task.done():
+            return
+        job.task.cancel()
+        work = self._unstarted.pop(job.id, None)
+        if work is not None:
+            # Cancelled before _run started, so its cleanup will never run: do it here
+            work.close()
+            job.update(status="failed", error="Cancelled")
+            if session_store.backend.persistent:
+                session_store.backend.save_job(self._kind, job.snapshot())
+
+    async def _run(self, job: J, work: Coroutine) -> None:
+        self._unstarted.pop(job.id, None)
+        publisher = asyncio.create_task(self._publish(job)) if session_store.backend.persistent else None
+        try:
+            await work
+            job.update(status="done")
+        except asyncio.CancelledError:
+            job.update(status="failed", error="Cancelled")
+            raise
+        except Exception as exc:
+            job.update(status="failed", error=str(exc))
+        finally:
+            if publisher is not None:
+                publisher.cancel()
+                session_store.backend.save_job(self._kind, job.snapshot())
+
+    async def _publish(self, job: J) -> None:
+        """Save the job's snapshot on change, at most every ``_POLL_SECONDS``, and as a heartbeat."""
+        while True:
+            changed = job.changed
+            session_store.backend.save_job(self._kind, job.snapshot())
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            await asyncio.sleep(_POLL_SECONDS)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self._retention_seconds
+        for job_id in [
+            jid for jid, j in self._jobs.items() if j.finished_at is not None and j.finished_at < cutoff
+        ]:
+            del self._jobs[job_id]
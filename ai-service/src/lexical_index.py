@@ -0,0 +1,79 @@
+import math
+import re
+import sys
+from array import array
+from collections import Counter
+
+import numpy as np
+
+# Words, numbers and dotted/hyphenated identifiers such as "7.4.2" or "iso-14971"
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.\-/][a-z0-9]+)*")
+# Per-term cost besides the term string: dict slot, tuple and two empty arrays
+_TERM_OVERHEAD = 2 * sys.getsizeof(array("I")) + sys.getsizeof((0, 0)) + 3 * 8
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """Okapi BM25 over a session's chunks, kept as an append-only inverted index.
+
+    Postings map each term to the chunk indices containing it and the term
+    frequency in each, so scoring a query only touches the chunks that share
+    a term with it. Postings are packed ``array("I")`` buffers rather than
+    lists of Python ints, and ``nbytes`` tracks their size for the session
+    memory budget.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self._postings: dict[str, tuple[array, array]] = {}
+        self._lengths = array("I")
+        self._total_length = 0
+        self.nbytes = sys.getsizeof(self._lengths)
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def add(self, chunks: list[str]) -> None:
+        for text in chunks:
+            doc = len(self._lengths)
+            terms = tokenize(text)
+            self._lengths.append(len(terms))
+            self._total_length += len(terms)
+            counts = Counter(terms)
+            for term, freq in counts.items():
+                posting = self._postings.get(term)
+                if posting is None:
+                    posting = self._postings[term] = (array("I"), array("I"))
+                    self.nbytes += sys.getsizeof(term) + _TERM_OVERHEAD
+                posting[0].append(doc)
+                posting[1].append(freq)
+            # Two uint32 per posting plus the chunk length
+            self.nbytes += 4 * (2 * len(counts) + 1)
+
+    def search(self, query: str, top_k: int) -> tuple[np.ndarray, np.ndarray]:
+        """Return ``(indices, scores)`` of the ``top_k`` best BM25 matches, best first."""
+        n = len(self._lengths)
+        if n == 0 or top_k <= 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+        lengths = np.frombuffer(self._lengths, dtype=np.uint32).astype(np.float32)
+        norm = self.k1 * (1 - self.b + self.b * lengths / (self._total_length / n or 1.0))
+        scores = np.zeros(n, dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            docs = np.frombuffer(posting[0], dtype=np.uint32)
+            freqs = np.frombuffer(posting[1], dtype=np.uint32).astype(np.float32)
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * freqs * (self.k1 + 1) / (freqs + norm[docs])
+        matched = np.flatnonzero(scores)
+        k = min(top_k, len(matched))
+        if k == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+        best = matched[np.argpartition(scores[matched], -k)[-k:]]
+        best = best[np.argsort(scores[best])[::-1]]
+        return best, scores[best]
@@ -2,16 +2,37 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
+from src.document_cache import document_cache
+from src.embedding_cache import embedding_cache
+from src.ingestion import ingestion_jobs
+from src.ollama_client import ollama
+from src.parser_pool import parser_pool
+from src.pregeneration import pregeneration_jobs
+from src.question_embeddings import question_embeddings
+from src.scheduler import scheduler
 from src.session_store import session_store
-from src.routers import sessions
+from src.suggestion_cache import suggestion_cache
+from src.warmup import model_warmer
+from src.routers import document_cache as document_cache_routes, question_pools, sessions
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    await ollama.start()
+    model_warmer.start()
+    parser_pool.start()
     await session_store.start_cleanup_task()
     yield
+    await model_warmer.stop()
+    await ingestion_jobs.shutdown()
+    await pregeneration_jobs.shutdown()
     await session_store.stop_cleanup_task()
+    session_store.close()
+    parser_pool.shutdown()
+    await ollama.close()
+    embedding_cache.close()
 
 
 app = FastAPI(
@@ -35,8 +56,34 @@ app.add_middleware(
 )
 
 app.include_router(sessions.router, prefix="/ai", tags=["sessions"])
+app.include_router(question_pools.router, prefix="/ai", tags=["question-pools"])
+app.include_router(document_cache_routes.router, prefix="/ai", tags=["document-cache"])
 
 
 @app.get("/ai/health", tags=["health"])
 async def health():
     return {"status": "ok"}
+
+
+@app.get("/ai/ready", tags=["health"])
+async def ready():
+    """200 once both models are loaded in Ollama, 503 otherwise."""
+    status = await model_warmer.readiness()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+@app.get("/ai/stats", tags=["health"])
+async def stats():
+    return {
+        "sessions": session_store.stats(),
+        "ingestion": ingestion_jobs.stats(),
+        "pregeneration": pregeneration_jobs.stats(),
+        "scheduler": scheduler.stats(),
+        "ollama": ollama.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "document_cache": document_cache.stats(),
+        "question_embeddings": question_embeddings.stats(),
+        "suggestion_cache": suggestion_cache.stats(),
+        "suggest_flights": sessions.suggest_flights.stats(),
+        "suggest_latest": sessions.suggest_latest.stats(),
+    }
@@ -1,78 +1,230 @@
+import asyncio
 import json
+from collections import Counter
+from contextlib import asynccontextmanager
 from typing import AsyncIterator
 
 import httpx
 
 from src.config import config
+from src.scheduler import scheduler
 
 
 class OllamaError(Exception):
     pass
 
 
+_METRIC_KEYS = (
+    "total_duration",
+    "load_duration",
+    "prompt_eval_count",
+    "prompt_eval_duration",
+    "eval_count",
+    "eval_duration",
+)
+
+
+def _chat_options() -> dict:
+    return {
+        "temperature": config.model.temperature,
+        "num_predict": config.model.max_tokens,
+        "num_ctx": config.model.num_ctx,
+    }
+
+
+def _timeout(read: float) -> httpx.Timeout:
+    return httpx.Timeout(read, connect=config.http.connect_timeout)
+
+
 class OllamaClient:
     def __init__(self) -> None:
         self._base_url = config.model.base_url
+        self._http: httpx.AsyncClient | None = None
+        self._requests: Counter[str] = Counter()
+        self._in_flight: Counter[str] = Counter()
+
+    async def start(self) -> None:
+        self._client()
+
+    async def close(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
 
     def _client(self) -> httpx.AsyncClient:
-        return httpx.AsyncClient(base_url=self._base_url, timeout=120.0)
+        """Return the shared pooled client, opening it on first use."""
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                base_url=self._base_url,
+                timeout=_timeout(config.http.chat_timeout),
+                limits=httpx.Limits(
+                    max_connections=config.http.max_connections,
+                    max_keepalive_connections=config.http.max_keepalive_connections,
+                    keepalive_expiry=config.http.keepalive_expiry,
+                ),
+            )
+        return self._http
+
+    @asynccontextmanager
+    async def _track(self, operation: str):
+        self._requests[operation] += 1
+        self._in_flight[operation] += 1
+        try:
+            yield
+        finally:
+            self._in_flight[operation] -= 1
+
+    def stats(self) -> dict:
+        pool = getattr(getattr(self._http, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        return {
+            "open": self._http is not None and not self._http.is_closed,
+            "connections": len(connections),
+            "idle_connections": sum(1 for c in connections if c.is_idle()),
+            "max_connections": config.http.max_connections,
+            "requests": dict(self._requests),
+            "in_flight": dict(self._in_flight),
+        }
 
     async def embed(self, text: str) -> list[float]:
-        async with self._client() as client:
-            response = await client.post(
-                "/api/embeddings",
-                json={"model": config.model.embed_model, "prompt": text},
+        return (await self._embed_inputs([text]))[0]
+
+    async def embed_batch(
+        self,
+        texts: list[str],
+        batch_size: int | None = None,
+        concurrency: int | None = None,
+    ) -> list[list[float]]:
+        """Embed many texts through multi-input ``/api/embed`` requests.
+
+        Texts are split into batches of ``batch_size``; at most ``concurrency``
+        batches are in flight at once and only a failed batch is retried.
+        Embeddings are returned in input order.
+        """
+        if not texts:
+            return []
+        batch_size = max(1, batch_size or config.embedding.batch_size)
+        semaphore = asyncio.Semaphore(max(1, concurrency or config.embedding.concurrency))
+
+        async def run(batch: list[str]) -> list[list[float]]:
+            async with semaphore:
+                return await self._embed_with_retry(batch)
+
+        batches = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+        results = await asyncio.gather(*(run(batch) for batch in batches))
+        return [embedding for batch in results for embedding in batch]
+
+    async def _embed_with_retry(self, batch: list[str]) -> list[list[float]]:
+        attempt = 0
+        while True:
+            try:
+                return await self._embed_inputs(batch)
+            except (OllamaError, httpx.HTTPError) as exc:
+                if attempt >= config.embedding.max_retries:
+                    raise OllamaError(f"Embedding batch failed: {exc}") from exc
+                attempt += 1
+                await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+
+    async def _embed_inputs(self, inputs: list[str]) -> list[list[float]]:
+        async with scheduler.slot(scheduler.embed), self._track("embed"):
+            response = await self._client().post(
+                "/api/embed",
+                json={
+                    "model": config.model.embed_model,
+                    "input": inputs,
+                    "keep_alive": config.model.keep_alive,
+                },
+                timeout=_timeout(config.http.embed_timeout),
             )
-            if response.status_code != 200:
-                raise OllamaError(f"Embedding failed: {response.text}")
-            return response.json()["embedding"]
+        if response.status_code != 200:
+            raise OllamaError(f"Embedding failed: {response.text}")
+        embeddings = response.json()["embeddings"]
+        if len(embeddings) != len(inputs):
+            raise OllamaError(
+                f"Embedding returned {len(embeddings)} vectors for {len(inputs)} inputs"
+            )
+        return embeddings
 
     async def chat(self, messages: list[dict]) -> str:
         """Non-streaming chat — returns the full assistant reply."""
-        async with self._client() as client:
-            response = await client.post(
+        async with self._track("chat"):
+            response = await self._client().post(
                 "/api/chat",
                 json={
                     "model": config.model.chat_model,
                     "messages": messages,
                     "stream": False,
-                    "options": {
-                        "temperature": config.model.temperature,
-                        "num_predict": config.model.max_tokens,
-                    },
+                    "keep_alive": config.model.keep_alive,
+                    "options": _chat_options(),
                 },
+                timeout=_timeout(config.http.chat_timeout),
             )
-            if response.status_code != 200:
-                raise OllamaError(f"Chat failed: {response.text}")
-            return response.json()["message"]["content"]
-
-    async def chat_stream(self, messages: list[dict]) -> AsyncIterator[str]:
-        """Streaming chat — yields content tokens as they arrive."""
-        async with self._client() as client:
-            async with client.stream(
-                "POST",
-                "/api/chat",
+        if response.status_code != 200:
+            raise OllamaError(f"Chat failed: {response.text}")
+        return response.json()["message"]["content"]
+
+    async def probe_chat(self) -> None:
+        """Generate a single token, loading the chat model if it is not resident."""
+        async with self._track("probe"):
+            response = await self._client().post(
+                "/api/generate",
                 json={
                     "model": config.model.chat_model,
-                    "messages": messages,
-                    "stream": True,
-                    "options": {
-                        "temperature": config.model.temperature,
-                        "num_predict": config.model.max_tokens,
-                    },
+                    "prompt": "ping",
+                    "stream": False,
+                    "keep_alive": config.model.keep_alive,
+                    "options": {**_chat_options(), "num_predict": 1},
                 },
-            ) as response:
-                if response.status_code != 200:
-                    raise OllamaError(f"Chat stream failed: {response.status_code}")
-                async for line in response.aiter_lines():
-                    if not line:
-                        continue
+                timeout=_timeout(config.http.chat_timeout),
+            )
+        if response.status_code != 200:
+            raise OllamaError(f"Chat probe failed: {response.text}")
+
+    async def running_models(self, timeout: float) -> dict[str, str]:
+        """Models currently loaded by Ollama (``/api/ps``), mapped to their expiry."""
+        response = await self._client().get("/api/ps", timeout=_timeout(timeout))
+        if response.status_code != 200:
+            raise OllamaError(f"Listing running models failed: {response.text}")
+        return {m["name"]: m.get("expires_at", "") for m in response.json().get("models", [])}
+
+    async def chat_stream(
+        self,
+        messages: list[dict],
+        metrics: dict | None = None,
+    ) -> AsyncIterator[str]:
+        """Streaming chat — yields content tokens as they arrive.
+
+        When ``metrics`` is given it is filled with Ollama's final timing and
+        token counts (``prompt_eval_count``, ``eval_count``, ...).
+        """
+        async with self._track("chat_stream"), self._client().stream(
+            "POST",
+            "/api/chat",
+            json={
+                "model": config.model.chat_model,
+                "messages": messages,
+                "stream": True,
+                "keep_alive": config.model.keep_alive,
+                "options": _chat_options(),
+            },
+            timeout=_timeout(config.http.chat_timeout),
+        ) as response:
+            if response.status_code != 200:
+                raise OllamaError(f"Chat stream failed: {response.status_code}")
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                try:
                     data = json.loads(line)
-                    token = data.get("message", {}).get("content", "")
-                    if token:
-                        yield token
-                    if data.get("done"):
-                        break
+                except json.JSONDecodeError as exc:
+                    raise OllamaError(f"Malformed chat stream line: {line[:200]!r}") from exc
+                token = data.get("message", {}).get("content", "")
+                if token:
+                    yield token
+                if data.get("done"):
+                    if metrics is not None:
+                        metrics.update({k: data[k] for k in _METRIC_KEYS if k in data})
+                    break
 
 
 ollama = OllamaClient()
@@ -0,0 +1,178 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable
+
+from src.config import config
+from src.dedup import PAGE_BREAK
+from src.document_pipeline import parse_document, parse_pdf_pages, pdf_page_count
+
+ProgressCallback = Callable[[int, int], None]
+
+
+class DocumentTooLarge(Exception):
+    pass
+
+
+class ParseTimeout(Exception):
+    pass
+
+
+class ParserPool:
+    """Process pool that keeps document parsing off the event loop.
+
+    PDFs are split into page ranges parsed in parallel across workers; other
+    formats are parsed by a single worker. Each document is bounded by
+    ``parsing.timeout_seconds`` and ``parsing.max_pages``.
+
+    No more tasks are submitted than there are workers, so a task never waits
+    inside the pool and the timeout starts when the document's first task
+    reaches a worker rather than when it is queued.
+
+    A worker stuck on a pathological document cannot be interrupted, so a
+    timeout with a task still running kills the pool's processes and starts a
+    fresh pool. Parses that were sharing the killed pool are retried once on
+    the new one.
+    """
+
+    def __init__(self) -> None:
+        self._executor: ProcessPoolExecutor | None = None
+        # One per worker; held from submission until the task finishes
+        self._slots: asyncio.Semaphore | None = None
+        # Bumped whenever the pool is replaced
+        self._generation = 0
+        self.recycled = 0
+
+    def start(self) -> None:
+        if self._executor is None:
+            workers = config.parsing.workers or os.cpu_count() or 1
+            if self._slots is None:
+                self._slots = asyncio.Semaphore(workers)
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _recycle(self, generation: int) -> None:
+        """Kill the workers of pool ``generation`` unless it was already replaced."""
+        if generation != self._generation or self._executor is None:
+            return
+        executor, self._executor = self._executor, None
+        self._generation += 1
+        self.recycled += 1
+        # No public API stops a running task; kill the worker processes instead
+        for process in list((executor._processes or {}).values()):
+            process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def parse(
+        self,
+        content: bytes,
+        filename: str,
+        on_progress: ProgressCallback | None = None,
+    ) -> str:
+        """Parse a document; ``on_progress(pages_parsed, pages_total)`` reports PDF progress."""
+        retried = False
+        while True:
+            self.start()
+            attempt = _Attempt(self._generation)
+            try:
+                # No deadline until a worker picks up the first task; see _run
+                async with asyncio.timeout(None) as attempt.timeout:
+                    return await self._parse(
+                        content, filename, on_progress or (lambda parsed, total: None), attempt
+                    )
+            except TimeoutError as exc:
+                if any(future.running() for future in attempt.futures):
+                    # Only killing the worker stops it; tasks still queued were just cancelled
+                    self._recycle(attempt.generation)
+                raise ParseTimeout(
+                    f"Parsing took longer than {config.parsing.timeout_seconds:g} seconds"
+                ) from exc
+            except BrokenProcessPool:
+                if attempt.generation == self._generation:
+                    # A worker died on this document itself; replace the pool for the next one
+                    self._recycle(attempt.generation)
+                    raise
+                if retried:
+                    raise
+                # Killed by another document's timeout; retry with a fresh deadline
+                retried = True
+
+    async def _run(self, attempt: "_Attempt", fn: Callable, *args):
+        """Run ``fn`` on a free worker, starting the attempt's deadline on its first task."""
+        loop = asyncio.get_running_loop()
+        await self._slots.acquire()
+        if attempt.generation != self._generation:
+            # Another document's timeout replaced the pool while this task waited
+            self._slots.release()
+            raise BrokenProcessPool("Parser pool was recycled")
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._release(loop))
+        attempt.futures.append(future)
+        if attempt.timeout.when() is None:
+            attempt.timeout.reschedule(loop.time() + config.parsing.timeout_seconds)
+        return await asyncio.wrap_future(future)
+
+    def _release(self, loop: asyncio.AbstractEventLoop) -> None:
+        # Called from the pool's thread; workers killed at shutdown finish after the loop
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(self._slots.release)
+
+    async def _parse(
+        self,
+        content: bytes,
+        filename: str,
+        on_progress: ProgressCallback,
+        attempt: "_Attempt",
+    ) -> str:
+        if Path(filename).suffix.lower() != ".pdf":
+            text = await self._run(attempt, parse_document, content, filename)
+            on_progress(1, 1)
+            return text
+
+        pages = await self._run(attempt, pdf_page_count, content)
+        if pages > config.parsing.max_pages:
+            raise DocumentTooLarge(
+                f"Document has {pages} pages; the limit is {config.parsing.max_pages}"
+            )
+        on_progress(0, pages)
+        step = max(1, config.parsing.pages_per_task)
+        parsed = 0
+
+        async def parse_range(start: int) -> list[str]:
+            nonlocal parsed
+            end = min(start + step, pages)
+            texts = await self._run(attempt, parse_pdf_pages, content, start, end)
+            parsed += end - start
+            on_progress(parsed, pages)
+            return texts
+
+        parts = await asyncio.gather(*(parse_range(start) for start in range(0, pages, step)))
+        # Keep page boundaries so repeated headers and footers can be detected
+        return PAGE_BREAK.join(text for part in parts for text in part)
+
+
+@dataclass(slots=True)
+class _Attempt:
+    """One try at parsing a document on pool ``generation``."""
+
+    generation: int
+    futures: list[Future] = field(default_factory=list)
+    timeout: asyncio.Timeout | None = None
+
+
+parser_pool = ParserPool()
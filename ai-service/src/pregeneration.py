@@ -0,0 +1,105 @@
+from dataclasses import dataclass, field
+
+from src.config import config
+from src.context_builder import AssembledContext
+from src.jobs import BackgroundJob, JobRegistry
+from src.ollama_client import OllamaError
+from src.question_embeddings import embed_questions
+from src.scheduler import BULK, set_caller
+from src.session_store import Session
+from src.suggest_pipeline import (
+    STREAM_EVENTS,
+    SuggestRequest,
+    pregenerated_key,
+    prepare_suggestion,
+    stream_generation,
+)
+from src.suggestion_cache import suggestion_cache
+
+
+@dataclass(slots=True)
+class PregenerationJob(BackgroundJob):
+    questions_total: int = 0
+    results: list[dict] = field(default_factory=list)
+
+    def snapshot(self) -> dict:
+        return {
+            **BackgroundJob.snapshot(self),
+            "questions_total": self.questions_total,
+            "questions_done": len(self.results),
+            "results": self.results,
+        }
+
+
+class PregenerationJobs(JobRegistry[PregenerationJob]):
+    def start_pregeneration(
+        self,
+        session: Session,
+        requests: list[tuple[str, SuggestRequest]],
+        regenerate: bool = False,
+    ) -> PregenerationJob:
+        job = PregenerationJob(id=self.new_id(), session_id=session.id, questions_total=len(requests))
+        return self.start(job, _pregenerate(job, session, requests, regenerate))
+
+
+async def _pregenerate(
+    job: PregenerationJob,
+    session: Session,
+    requests: list[tuple[str, SuggestRequest]],
+    regenerate: bool,
+) -> None:
+    """Generate suggestions for every question and store them in the suggestion cache.
+
+    Query embeddings are fetched in one batch up front and questions retrieving
+    the same chunks share one assembled context. Generation runs one question at
+    a time at bulk priority so interactive suggest calls are served first, and
+    shares its stream with a suggest call for the same inputs. Each reply is
+    also cached under a key without previous answers, so later suggest calls
+    for the question still hit once earlier questions are answered.
+    """
+    set_caller(session.id, BULK)
+    job.update(status="embedding")
+    vectors: list = [None] * len(requests)
+    lexical_only = False
+    if session.chunks:
+        try:
+            vectors = await embed_questions(
+                [(body.question_identifier, body.question_text) for _, body in requests]
+            )
+        except OllamaError:
+            if config.retrieval.mode == "vector":
+                raise
+            # Embedding service down: still pregenerate from BM25 retrieval
+            lexical_only = True
+
+    job.update(status="generating")
+    contexts: dict[tuple[int, ...], AssembledContext] = {}
+    for (question_id, body), vector in zip(requests, vectors):
+        prepared = await prepare_suggestion(
+            session, body, query_embedding=vector, contexts=contexts, lexical_only=lexical_only
+        )
+        events = None if regenerate else suggestion_cache.get(prepared.cache_key)
+        cached = events is not None
+        error = None
+        if events is None:
+            items = [item async for item in stream_generation(prepared)]
+            events = [item for item in items if item[0] not in STREAM_EVENTS]
+            error = next((payload["detail"] for name, payload in items if name == "error"), None)
+        if error is None and any(name == "suggestion" for name, _ in events):
+            suggestion_cache.put(pregenerated_key(session, body), events)
+
+        guidance = next((payload["text"] for name, payload in events if name == "guidance"), None)
+        job.results.append(
+            {
+                "question_id": question_id,
+                "question_identifier": body.question_identifier,
+                "guidance": guidance,
+                "suggestions": [payload for name, payload in events if name == "suggestion"],
+                "cached": cached,
+                "error": error,
+            }
+        )
+        job.update()
+
+
+pregeneration_jobs = PregenerationJobs("pregeneration")
@@ -0,0 +1,90 @@
+import numpy as np
+
+from src.config import config
+from src.embedding_cache import embed_text, embed_texts, text_hash
+
+QuestionKey = tuple[str, str, str]
+
+
+class QuestionEmbeddingStore:
+    """Query embeddings precomputed for the questions of warmed question pools.
+
+    Entries are keyed by ``(embed model, question identifier, sha256(text))`` so an
+    edited question text never reuses a stale vector. Unlike the embedding cache
+    these entries are pinned until their pool is re-warmed or dropped.
+    """
+
+    def __init__(self) -> None:
+        self._vectors: dict[QuestionKey, np.ndarray] = {}
+        self._pools: dict[str, set[QuestionKey]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(identifier: str, text: str) -> QuestionKey:
+        return (config.model.embed_model, identifier, text_hash(text))
+
+    async def warm(self, pool_id: str, questions: list[tuple[str, str]]) -> int:
+        """Embed a pool's ``(identifier, text)`` pairs; returns how many were new."""
+        keys = [self._key(identifier, text) for identifier, text in questions]
+        pending = [(key, text) for key, (_, text) in zip(keys, questions) if key not in self._vectors]
+        if pending:
+            vectors = await embed_texts([text for _, text in pending])
+            for (key, _), vector in zip(pending, vectors):
+                self._vectors[key] = vector
+        self._pools[pool_id] = set(keys)
+        self._prune()
+        return len(pending)
+
+    def drop(self, pool_id: str) -> bool:
+        if self._pools.pop(pool_id, None) is None:
+            return False
+        self._prune()
+        return True
+
+    def get(self, identifier: str, text: str) -> np.ndarray | None:
+        vector = self._vectors.get(self._key(identifier, text))
+        if vector is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return vector
+
+    def stats(self) -> dict:
+        return {
+            "pools": len(self._pools),
+            "questions": len(self._vectors),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def _prune(self) -> None:
+        live = set().union(*self._pools.values()) if self._pools else set()
+        for key in [k for k in self._vectors if k not in live]:
+            del self._vectors[key]
+
+
+async def embed_question(identifier: str | None, text: str) -> np.ndarray:
+    """Return the query embedding for a question, skipping Ollama for warmed pools."""
+    if identifier:
+        vector = question_embeddings.get(identifier, text)
+        if vector is not None:
+            return vector
+    return await embed_text(text)
+
+
+async def embed_questions(questions: list[tuple[str | None, str]]) -> list[np.ndarray]:
+    """Batch form of ``embed_question``: all misses go to Ollama in one call."""
+    vectors: list[np.ndarray | None] = [
+        question_embeddings.get(identifier, text) if identifier else None
+        for identifier, text in questions
+    ]
+    missing = [i for i, v in enumerate(vectors) if v is None]
+    if missing:
+        fresh = await embed_texts([questions[i][1] for i in missing])
+        for i, vector in zip(missing, fresh):
+            vectors[i] = vector
+    return vectors
+
+
+question_embeddings = QuestionEmbeddingStore()
@@ -0,0 +1,50 @@
+import hmac
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+from pydantic import BaseModel
+
+from src.config import config
+from src.document_cache import document_cache
+
+
+def require_admin(x_admin_token: str | None = Header(default=None)) -> None:
+    """Admin routes list every user's uploads; hide them unless a token is configured."""
+    if config.admin.token is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, config.admin.token):
+        raise HTTPException(status_code=401, detail="Admin token required")
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+# --------------------------------------------------------------------------- #
+# Models                                                                        #
+# --------------------------------------------------------------------------- #
+
+
+class PurgeResponse(BaseModel):
+    purged: int
+
+
+# --------------------------------------------------------------------------- #
+# Routes                                                                        #
+# --------------------------------------------------------------------------- #
+
+
+@router.get("/document-cache")
+async def list_cached_documents():
+    return {**document_cache.stats(), "entries": document_cache.list()}
+
+
+@router.delete("/document-cache", response_model=PurgeResponse)
+async def purge_document_cache():
+    return PurgeResponse(purged=document_cache.purge())
+
+
+@router.delete("/document-cache/{sha256}", response_model=PurgeResponse)
+async def purge_cached_document(sha256: str):
+    purged = document_cache.purge(sha256)
+    if not purged:
+        raise HTTPException(status_code=404, detail="Document not cached")
+    return PurgeResponse(purged=purged)
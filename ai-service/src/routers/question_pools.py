@@ -0,0 +1,50 @@
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from src.ollama_client import OllamaError
+from src.question_embeddings import question_embeddings
+from src.scheduler import BULK, set_caller
+
+router = APIRouter()
+
+
+# --------------------------------------------------------------------------- #
+# Models                                                                        #
+# --------------------------------------------------------------------------- #
+
+
+class PoolQuestion(BaseModel):
+    identifier: str
+    text: str
+
+
+class WarmPoolRequest(BaseModel):
+    questions: list[PoolQuestion]
+
+
+class WarmPoolResponse(BaseModel):
+    pool_id: str
+    questions: int
+    embedded: int
+
+
+# --------------------------------------------------------------------------- #
+# Routes                                                                        #
+# --------------------------------------------------------------------------- #
+
+
+@router.put("/question-pools/{pool_id}/embeddings", response_model=WarmPoolResponse)
+async def warm_question_pool(pool_id: str, body: WarmPoolRequest):
+    set_caller(f"pool:{pool_id}", BULK)
+    try:
+        embedded = await question_embeddings.warm(
+            pool_id, [(q.identifier, q.text) for q in body.questions]
+        )
+    except OllamaError as exc:
+        raise HTTPException(status_code=503, detail=f"Embedding failed: {exc}") from exc
+    return WarmPoolResponse(pool_id=pool_id, questions=len(body.questions), embedded=embedded)
+
+
+@router.delete("/question-pools/{pool_id}/embeddings", status_code=204)
+async def drop_question_pool(pool_id: str):
+    question_embeddings.drop(pool_id)
@@ -1,16 +1,33 @@
+import asyncio
 import json
-import textwrap
+from typing import AsyncIterable
 
-from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi import APIRouter, HTTPException, Request, UploadFile, File
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from src.config import config
-from src.document_pipeline import chunk_text, parse_document, retrieve
-from src.ollama_client import OllamaError, ollama
+from src.ingestion import IngestionJob, ingestion_jobs
+from src.jobs import StoredJob
+from src.ollama_client import OllamaError
+from src.pregeneration import PregenerationJob, pregeneration_jobs
+from src.scheduler import INTERACTIVE, QueueFull, scheduler, set_caller
 from src.session_store import session_store
+from src.singleflight import LatestWins
+from src.suggest_pipeline import (
+    PreparedSuggestion,
+    SuggestRequest,
+    pregenerated_key,
+    prepare_suggestion,
+    request_key,
+    stream_generation,
+    suggest_flights,
+)
+from src.suggestion_cache import suggestion_cache
+from src.suggestion_parser import SuggestionEvent
 
 router = APIRouter()
+suggest_latest = LatestWins()
 
 SUPPORTED_TYPES = {
     "application/pdf",
@@ -28,12 +45,21 @@ class SessionResponse(BaseModel):
     session_id: str
 
 
-class SuggestRequest(BaseModel):
-    question_text: str
-    question_identifier: str | None = None
-    previous_answers: dict[str, str] = {}
+class JobResponse(BaseModel):
+    job_id: str
+
+
+class PregenerateQuestion(BaseModel):
+    id: str
+    identifier: str
+    text: str
+
+
+class PregenerateRequest(BaseModel):
+    questions: list[PregenerateQuestion]
     study_metadata: dict[str, str | None] = {}
-    current_draft: str | None = None
+    previous_answers: dict[str, str] = {}
+    regenerate: bool = False
 
 
 # --------------------------------------------------------------------------- #
@@ -47,7 +73,7 @@ async def create_session():
     return SessionResponse(session_id=session.id)
 
 
-@router.post("/sessions/{session_id}/documents", status_code=204)
+@router.post("/sessions/{session_id}/documents", status_code=202, response_model=JobResponse)
 async def upload_document(
     session_id: str,
     file: UploadFile = File(...),
@@ -58,52 +84,124 @@ async def upload_document(
 
     content = await file.read()
     filename = file.filename or "document"
+    job = ingestion_jobs.start_ingestion(session, content, filename)
+    return JobResponse(job_id=job.id)
+
+
+@router.get("/sessions/{session_id}/jobs/{job_id}")
+async def get_ingestion_job(session_id: str, job_id: str):
+    return _get_job(session_id, job_id).snapshot()
+
+
+@router.get("/sessions/{session_id}/jobs/{job_id}/events")
+async def stream_ingestion_job(session_id: str, job_id: str):
+    job = _get_job(session_id, job_id)
+    return StreamingResponse(
+        _stream_job_sse(job),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        },
+    )
 
-    try:
-        text = parse_document(content, filename)
-    except Exception as exc:
-        raise HTTPException(status_code=422, detail=f"Could not parse document: {exc}") from exc
 
-    chunks = chunk_text(text)
-    if not chunks:
-        raise HTTPException(status_code=422, detail="Document appears to be empty")
+@router.post("/sessions/{session_id}/suggest")
+async def suggest(session_id: str, body: SuggestRequest, request: Request):
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
 
+    set_caller(session_id, INTERACTIVE)
+    # Draft edits resend suggest for the same question; only the newest counts
+    flight_key = request_key(session_id, body)
+    latest_key = (session_id, body.question_identifier)
+    supersede = config.suggest.supersede and body.question_identifier is not None
+    if supersede:
+        suggest_latest.claim(latest_key, flight_key)
     try:
-        embeddings = [await ollama.embed(chunk) for chunk in chunks]
+        if supersede and config.suggest.debounce_ms > 0:
+            await asyncio.sleep(config.suggest.debounce_ms / 1000)
+            if not suggest_latest.still_latest(latest_key, flight_key):
+                return _superseded_response()
+
+        # Identical concurrent requests share one embedding call and one generation
+        prepared = await suggest_flights.call(flight_key, lambda: prepare_suggestion(session, body))
+        if supersede and not suggest_latest.still_latest(latest_key, flight_key):
+            return _superseded_response()
+        cached = None if body.regenerate else suggestion_cache.get(prepared.cache_key)
+        pregenerated = False
+        if cached is None and not body.regenerate and not (body.current_draft or "").strip():
+            # Answers given since pregeneration change the exact key, not the question
+            cached = suggestion_cache.get(pregenerated_key(session, body))
+            pregenerated = cached is not None
+        subscription = None
+        if cached is not None:
+            stream = _replay_events(cached, prepared, pregenerated)
+        elif suggest_flights.shared(prepared.cache_key) is None and scheduler.generate.should_shed(
+            config.suggest.retrieval_only_wait_seconds
+        ):
+            # A new generation would queue too long: answer from retrieval alone
+            stream = _sources_only_events(prepared)
+        else:
+            stream = subscription = stream_generation(
+                prepared, is_disconnected=request.is_disconnected
+            )
+        if supersede:
+            suggest_latest.attach(latest_key, flight_key, subscription, ("superseded", {}))
+    except QueueFull as exc:
+        raise HTTPException(
+            status_code=429, detail=str(exc), headers={"Retry-After": str(exc.retry_after)}
+        ) from exc
     except OllamaError as exc:
         raise HTTPException(status_code=503, detail=f"Embedding failed: {exc}") from exc
+    finally:
+        if supersede:
+            suggest_latest.release(latest_key, flight_key)
 
-    session.chunks.extend(chunks)
-    session.embeddings.extend(embeddings)
+    return StreamingResponse(
+        _sse_events(stream),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "X-Prompt-Tokens": str(prepared.usage["prompt_tokens"]),
+        },
+    )
 
 
-@router.post("/sessions/{session_id}/suggest")
-async def suggest(session_id: str, body: SuggestRequest):
+@router.post("/sessions/{session_id}/pregenerate", status_code=202, response_model=JobResponse)
+async def pregenerate(session_id: str, body: PregenerateRequest):
     session = session_store.get(session_id)
     if session is None:
         raise HTTPException(status_code=404, detail="Session not found or expired")
 
-    # Retrieve relevant chunks
-    context_text = ""
-    if session.chunks:
-        try:
-            query_embedding = await ollama.embed(body.question_text)
-        except OllamaError as exc:
-            raise HTTPException(status_code=503, detail=f"Embedding failed: {exc}") from exc
-
-        top_chunks = retrieve(
-            query_embedding,
-            session.embeddings,
-            session.chunks,
-            top_k=config.retrieval.top_k,
+    requests = [
+        (
+            q.id,
+            SuggestRequest(
+                question_text=q.text,
+                question_identifier=q.identifier,
+                previous_answers=body.previous_answers,
+                study_metadata=body.study_metadata,
+            ),
         )
-        context_text = "\n\n---\n\n".join(top_chunks)
+        for q in body.questions
+    ]
+    job = pregeneration_jobs.start_pregeneration(session, requests, regenerate=body.regenerate)
+    return JobResponse(job_id=job.id)
+
+
+@router.get("/sessions/{session_id}/pregenerate/{job_id}")
+async def get_pregeneration_job(session_id: str, job_id: str):
+    return _get_pregeneration_job(session_id, job_id).snapshot()
 
-    prompt = _build_prompt(body, context_text)
-    messages = [{"role": "user", "content": prompt}]
 
+@router.get("/sessions/{session_id}/pregenerate/{job_id}/events")
+async def stream_pregeneration_job(session_id: str, job_id: str):
+    job = _get_pregeneration_job(session_id, job_id)
     return StreamingResponse(
-        _stream_sse(messages),
+        _stream_pregeneration_sse(job),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -114,6 +212,8 @@ async def suggest(session_id: str, body: SuggestRequest):
 
 @router.delete("/sessions/{session_id}", status_code=204)
 async def delete_session(session_id: str):
+    ingestion_jobs.cancel_session(session_id)
+    pregeneration_jobs.cancel_session(session_id)
     session_store.delete(session_id)
 
 
@@ -122,92 +222,68 @@ async def delete_session(session_id: str):
 # --------------------------------------------------------------------------- #
 
 
-def _build_prompt(body: SuggestRequest, context_text: str) -> str:
-    prev = "\n".join(f"- {k}: {v}" for k, v in body.previous_answers.items()) or "None"
-    meta = "\n".join(f"- {k}: {v}" for k, v in body.study_metadata.items() if v) or "None"
-    ctx = context_text or "No reference documents uploaded."
-    draft = body.current_draft.strip() if body.current_draft and body.current_draft.strip() else None
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
-    parts = [
-        textwrap.dedent(f"""
-            You are an expert clinical trial document assistant.
 
-            ## Reference documents
-            {ctx}
+def _get_job(session_id: str, job_id: str) -> IngestionJob | StoredJob:
+    job = ingestion_jobs.get(session_id, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    return job
 
-            ## Study metadata
-            {meta}
 
-            ## Previous answers in this document
-            {prev}
+async def _stream_job_sse(job: IngestionJob | StoredJob):
+    async for snapshot in job.updates():
+        yield _sse("progress", snapshot)
+    if job.status == "failed":
+        yield _sse("error", {"detail": job.error})
+    yield _sse("done", {})
 
-            ## Current question
-            {body.question_text}
-        """).strip()
-    ]
 
-    if draft:
-        parts.append(textwrap.dedent(f"""
-            ## User's current draft
-            \"\"\"{draft}\"\"\"
-        """).strip())
-
-    suggestion_constraint = (
-        "Each suggestion must build upon, complete, or refine the user's current draft — "
-        "it must be coherent with what the user has already written and must not contradict it."
-        if draft else
-        "Each suggestion must be relevant to the question and consistent with the study context."
-    )
+def _get_pregeneration_job(session_id: str, job_id: str) -> PregenerationJob | StoredJob:
+    job = pregeneration_jobs.get(session_id, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Pregeneration job not found")
+    return job
 
-    parts.append(textwrap.dedent(f"""
-        Respond ONLY with a valid JSON object — no prose before or after — using this exact schema:
-        {{
-          "guidance": "<one short paragraph explaining what a good answer should cover>",
-          "suggestions": [
-            {{
-              "rank": 1,
-              "text": "<suggested answer text>",
-              "rationale": "<one sentence explaining why>",
-              "sources": ["<brief excerpt from reference doc that supports this>"]
-            }}
-          ]
-        }}
 
-        Provide 1 to 3 suggestions ranked by relevance. Keep each suggestion concise.
-        {suggestion_constraint}
-    """).strip())
+async def _stream_pregeneration_sse(job: PregenerationJob | StoredJob):
+    sent = 0
+    async for _ in job.updates():
+        for result in job.results[sent:]:
+            yield _sse("result", result)
+        sent = len(job.results)
+    if job.status == "failed":
+        yield _sse("error", {"detail": job.error})
+    yield _sse("done", {"questions_done": sent, "questions_total": job.questions_total})
 
-    return "\n\n".join(parts)
 
+async def _sse_events(events: AsyncIterable[SuggestionEvent]):
+    async for event, payload in events:
+        yield _sse(event, payload)
 
-async def _stream_sse(messages: list[dict]):
-    try:
-        raw = await ollama.chat(messages)
-    except OllamaError as exc:
-        yield f"event: error\ndata: {json.dumps({'detail': str(exc)})}\n\n"
-        return
 
-    # Parse the JSON reply and emit typed SSE events
-    try:
-        # Strip markdown code fences if the model wrapped the JSON
-        clean = raw.strip()
-        if clean.startswith("```"):
-            lines = clean.splitlines()
-            clean = "\n".join(
-                l for l in lines if not l.startswith("```")
-            ).strip()
-        result = json.loads(clean)
-    except json.JSONDecodeError:
-        # Fallback: emit the raw text as guidance so the user sees something
-        yield f"event: guidance\ndata: {json.dumps({'text': raw})}\n\n"
-        yield "event: done\ndata: {}\n\n"
-        return
-
-    guidance = result.get("guidance", "")
-    if guidance:
-        yield f"event: guidance\ndata: {json.dumps({'text': guidance})}\n\n"
-
-    for suggestion in result.get("suggestions", []):
-        yield f"event: suggestion\ndata: {json.dumps(suggestion)}\n\n"
-
-    yield "event: done\ndata: {}\n\n"
+def _superseded_response() -> StreamingResponse:
+    async def stream():
+        yield _sse("superseded", {})
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+async def _replay_events(
+    events: list[SuggestionEvent], prepared: PreparedSuggestion, pregenerated: bool
+):
+    yield "sources", {"sources": prepared.sources}
+    for event in events:
+        yield event
+    yield "done", {**prepared.usage, "cached": True, "pregenerated": pregenerated}
+
+
+async def _sources_only_events(prepared: PreparedSuggestion):
+    yield "sources", {"sources": prepared.sources}
+    yield "done", {**prepared.usage, "cached": False, "retrieval_only": True}
@@ -0,0 +1,274 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator
+
+from src.config import config
+
+INTERACTIVE = 0
+BULK = 1
+
+# (fairness key, priority) of the work running in the current task
+_caller: ContextVar[tuple[str, int]] = ContextVar("scheduler_caller", default=("", INTERACTIVE))
+
+
+class QueueFull(Exception):
+    def __init__(self, pool: str, retry_after: int) -> None:
+        super().__init__(f"The {pool} queue is full; retry in {retry_after} s")
+        self.retry_after = retry_after
+
+
+def set_caller(key: str, priority: int = INTERACTIVE) -> None:
+    """Tag work started from the current task for fairness and priority."""
+    _caller.set((key, priority))
+
+
+def caller_priority() -> int:
+    return _caller.get()[1]
+
+
+class Ticket:
+    def __init__(self, pool: "SlotPool", key: str, priority: int) -> None:
+        self.pool = pool
+        self.key = key
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.granted_at: float | None = None
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._released = False
+
+    @property
+    def waited_seconds(self) -> float:
+        end = self.granted_at if self.granted_at is not None else time.monotonic()
+        return end - self.enqueued_at
+
+    def status(self) -> dict:
+        return {
+            "position": self.pool.position(self),
+            "queue_depth": self.pool.waiting,
+            "waited_seconds": round(self.waited_seconds, 2),
+        }
+
+    async def wait(self, interval: float = 1.0) -> AsyncIterator[dict]:
+        """Yield queue status while waiting; returns once the slot is granted."""
+        last = None
+        while not self.future.done():
+            status = self.status()
+            if status["position"] != last:
+                last = status["position"]
+                yield status
+            try:
+                await asyncio.wait_for(asyncio.shield(self.future), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self.pool.release(self)
+
+    def promote(self, priority: int) -> None:
+        """Move a waiting ticket up to ``priority``, e.g. when interactive work joins it."""
+        self.pool.promote(self, priority)
+
+    def cancel(self) -> None:
+        """Release a ticket whose work was abandoned before it completed."""
+        if not self._released:
+            self._released = True
+            self.pool.cancel(self)
+
+
+class SlotPool:
+    """Concurrency slots for one kind of Ollama work with a fair wait queue.
+
+    Interactive tickets are always granted before bulk ones. Within a priority,
+    waiting tickets are granted round-robin across fairness keys (sessions), so
+    one session cannot starve the others. Only interactive waiters count toward
+    ``max_queue``; bulk work is never rejected, it just waits.
+    """
+
+    def __init__(self, name: str, slots: int, max_queue: int) -> None:
+        self.name = name
+        self.slots = max(1, slots)
+        self.max_queue = max_queue
+        self.active = 0
+        self._queues: tuple[OrderedDict[str, deque[Ticket]], ...] = (OrderedDict(), OrderedDict())
+        self._granted = 0
+        self._rejected = 0
+        self._shed = 0
+        self._wait_total = 0.0
+        self._hold_avg = 1.0
+        self._cancelled_queued = 0
+        self._cancelled_running = 0
+        self._reclaimed_seconds = 0.0
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(q) for queue in self._queues for q in queue.values())
+
+    def submit(self, key: str, priority: int) -> Ticket:
+        ticket = Ticket(self, key, priority)
+        if self.active < self.slots and not self.waiting:
+            self._grant(ticket)
+            return ticket
+        if priority == INTERACTIVE and self._interactive_waiting() >= self.max_queue:
+            self._rejected += 1
+            raise QueueFull(self.name, self.retry_after())
+        self._queues[priority].setdefault(key, deque()).append(ticket)
+        return ticket
+
+    def release(self, ticket: Ticket) -> None:
+        if ticket.granted_at is None:
+            self._remove(ticket)
+            ticket.future.cancel()
+            return
+        held = time.monotonic() - ticket.granted_at
+        self._hold_avg = 0.8 * self._hold_avg + 0.2 * held
+        self.active -= 1
+        self._dispatch()
+
+    def cancel(self, ticket: Ticket) -> None:
+        """Like ``release`` but counts the slot time the abandoned work would have used."""
+        if ticket.granted_at is None:
+            self._cancelled_queued += 1
+            self._reclaimed_seconds += self._hold_avg
+            self._remove(ticket)
+            ticket.future.cancel()
+            return
+        # Cut-short holds are left out of the average so Retry-After stays honest
+        held = time.monotonic() - ticket.granted_at
+        self._cancelled_running += 1
+        self._reclaimed_seconds += max(0.0, self._hold_avg - held)
+        self.active -= 1
+        self._dispatch()
+
+    def promote(self, ticket: Ticket, priority: int) -> None:
+        if ticket.granted_at is not None or ticket.future.done() or priority >= ticket.priority:
+            return
+        self._remove(ticket)
+        ticket.priority = priority
+        self._queues[priority].setdefault(ticket.key, deque()).append(ticket)
+
+    def position(self, ticket: Ticket) -> int:
+        """1-based place in the grant order, or 0 once granted."""
+        if ticket.granted_at is not None:
+            return 0
+        for place, queued in enumerate(self._grant_order(), start=1):
+            if queued is ticket:
+                return place
+        return 0
+
+    def expected_wait(self) -> float:
+        """Seconds a new interactive ticket would likely wait for a slot."""
+        backlog = self._interactive_waiting() + self.active - self.slots + 1
+        return max(0.0, self._hold_avg * backlog / self.slots)
+
+    def should_shed(self, max_wait_seconds: float) -> bool:
+        """Whether new interactive work should skip this pool; ``0`` disables shedding."""
+        if max_wait_seconds <= 0 or self.expected_wait() <= max_wait_seconds:
+            return False
+        self._shed += 1
+        return True
+
+    def retry_after(self) -> int:
+        backlog = self._interactive_waiting() + self.active
+        return max(1, math.ceil(self._hold_avg * backlog / self.slots))
+
+    def stats(self) -> dict:
+        return {
+            "slots": self.slots,
+            "active": self.active,
+            "waiting": self.waiting,
+            "granted": self._granted,
+            "rejected": self._rejected,
+            "shed": self._shed,
+            "avg_wait_seconds": round(self._wait_total / self._granted, 3) if self._granted else 0.0,
+            "avg_hold_seconds": round(self._hold_avg, 3),
+            "cancelled_queued": self._cancelled_queued,
+            "cancelled_running": self._cancelled_running,
+            "reclaimed_seconds_estimate": round(self._reclaimed_seconds, 1),
+        }
+
+    def _interactive_waiting(self) -> int:
+        return sum(len(q) for q in self._queues[INTERACTIVE].values())
+
+    def _grant(self, ticket: Ticket) -> None:
+        ticket.granted_at = time.monotonic()
+        self.active += 1
+        self._granted += 1
+        self._wait_total += ticket.waited_seconds
+        ticket.future.set_result(None)
+
+    def _dispatch(self) -> None:
+        while self.active < self.slots:
+            ticket = self._pop_next()
+            if ticket is None:
+                return
+            self._grant(ticket)
+
+    def _pop_next(self) -> Ticket | None:
+        for queue in self._queues:
+            while queue:
+                key, tickets = next(iter(queue.items()))
+                ticket = tickets.popleft()
+                # Round-robin: the session goes to the back of its priority class
+                del queue[key]
+                if tickets:
+                    queue[key] = tickets
+                if not ticket.future.done():
+                    return ticket
+        return None
+
+    def _grant_order(self) -> list[Ticket]:
+        order: list[Ticket] = []
+        for queue in self._queues:
+            columns = [list(tickets) for tickets in queue.values()]
+            depth = max((len(c) for c in columns), default=0)
+            for row in range(depth):
+                order.extend(c[row] for c in columns if row < len(c))
+        return order
+
+    def _remove(self, ticket: Ticket) -> None:
+        queue = self._queues[ticket.priority]
+        tickets = queue.get(ticket.key)
+        if tickets is None:
+            return
+        try:
+            tickets.remove(ticket)
+        except ValueError:
+            return
+        if not tickets:
+            del queue[ticket.key]
+
+
+class LLMScheduler:
+    """Admission control in front of Ollama with separate embed/generate slots."""
+
+    def __init__(self) -> None:
+        self.embed = SlotPool("embed", config.scheduler.embed_slots, config.scheduler.max_queue)
+        self.generate = SlotPool(
+            "generate", config.scheduler.generate_slots, config.scheduler.max_queue
+        )
+
+    def submit(self, pool: SlotPool) -> Ticket:
+        key, priority = _caller.get()
+        return pool.submit(key, priority)
+
+    @asynccontextmanager
+    async def slot(self, pool: SlotPool):
+        """Hold a slot of ``pool`` for the duration of the block."""
+        ticket = self.submit(pool)
+        try:
+            await ticket.future
+            yield ticket
+        finally:
+            ticket.release()
+
+    def stats(self) -> dict:
+        return {"embed": self.embed.stats(), "generate": self.generate.stats()}
+
+
+scheduler = LLMScheduler()
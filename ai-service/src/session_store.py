@@ -1,48 +1,457 @@
 import asyncio
+import heapq
+import json
+import sqlite3
+import sys
 import time
 import uuid
+from collections import OrderedDict
 from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
 
 from src.config import config
+from src.dedup import ChunkDeduper
+from src.document_pipeline import EmbeddingMatrix
+from src.lexical_index import BM25Index
+
 
+class SessionTooLarge(Exception):
+    pass
 
-@dataclass
+
+@dataclass(slots=True)
 class Session:
     id: str
     created_at: float = field(default_factory=time.time)
     last_used: float = field(default_factory=time.time)
     chunks: list[str] = field(default_factory=list)
-    embeddings: list[list[float]] = field(default_factory=list)
+    embeddings: EmbeddingMatrix = field(default_factory=EmbeddingMatrix)
+    lexical: BM25Index = field(default_factory=BM25Index)
+    dedup: ChunkDeduper = field(default_factory=ChunkDeduper)
+    chunk_bytes: int = 0
+    # Leading excerpt of the first document, pinned into the prompt prefix
+    pinned_summary: str = ""
+    # Hash of the last system prefix sent, to tell whether Ollama can reuse it
+    prefix_hash: str = ""
+
+    @property
+    def nbytes(self) -> int:
+        return self.chunk_bytes + self.embeddings.nbytes + self.lexical.nbytes + self.dedup.nbytes
 
     def touch(self) -> None:
         self.last_used = time.time()
 
+    def expires_at(self) -> float:
+        return self.last_used + config.session.ttl_seconds
+
     def is_expired(self) -> bool:
-        return (time.time() - self.last_used) > config.session.ttl_seconds
+        return time.time() > self.expires_at()
+
+
+# --------------------------------------------------------------------------- #
+# Backends                                                                      #
+# --------------------------------------------------------------------------- #
+
+
+class MemorySessionBackend:
+    """Keeps nothing outside the worker: sessions exist only in ``SessionStore``."""
+
+    name = "memory"
+    persistent = False
+
+    def create(self, session: Session) -> None:
+        pass
+
+    def load(self, session_id: str) -> Session | None:
+        return None
+
+    def state(self, session_id: str) -> tuple[int, float] | None:
+        """``(chunk count, last used)`` as stored, or ``None`` if unknown."""
+        return None
+
+    def append(self, session: Session, chunks: list[str], rows: np.ndarray) -> int | None:
+        """Store new chunks and normalised rows; returns the prior stored chunk count."""
+        return len(session.chunks) - len(chunks)
+
+    def touch(self, session: Session) -> None:
+        pass
+
+    def delete(self, session_id: str) -> None:
+        pass
+
+    def purge_expired(self, cutoff: float) -> int:
+        return 0
+
+    def save_job(self, kind: str, snapshot: dict) -> None:
+        """Publish a background job's snapshot to other workers."""
+
+    def load_job(self, kind: str, job_id: str) -> tuple[dict, float] | None:
+        """``(snapshot, updated_at)`` of a job saved by any worker, or ``None``."""
+        return None
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteSessionBackend(MemorySessionBackend):
+    """Sessions shared by every worker on the host and kept across restarts.
+
+    Metadata and chunk text live in ``sessions.db``; embeddings are appended as
+    normalised float32 rows to ``embeddings/<session id>.f32`` and memory-mapped
+    on load, so a worker only pages in the vectors it actually searches.
+    Appends run inside ``BEGIN IMMEDIATE`` so concurrent writers from several
+    workers keep file rows and chunk indices in the same order.
+    """
+
+    name = "sqlite"
+    persistent = True
+    # Seconds between last_used writes for a session that keeps being read
+    _TOUCH_INTERVAL = 30.0
+
+    def __init__(self, data_dir: str) -> None:
+        self._dir = Path(data_dir)
+        (self._dir / "embeddings").mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self._dir / "sessions.db", timeout=30, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id TEXT PRIMARY KEY, created_at REAL NOT NULL, last_used REAL NOT NULL, "
+            "chunk_count INTEGER NOT NULL DEFAULT 0, dim INTEGER NOT NULL DEFAULT 0, "
+            "pinned_summary TEXT NOT NULL DEFAULT '')"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "session_id TEXT NOT NULL, idx INTEGER NOT NULL, text TEXT NOT NULL, "
+            "PRIMARY KEY (session_id, idx))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, session_id TEXT NOT NULL, "
+            "snapshot TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._touched: dict[str, float] = {}
+
+    def create(self, session: Session) -> None:
+        self._db.execute(
+            "INSERT INTO sessions (id, created_at, last_used) VALUES (?, ?, ?)",
+            (session.id, session.created_at, session.last_used),
+        )
+
+    def load(self, session_id: str) -> Session | None:
+        row = self._db.execute(
+            "SELECT created_at, last_used, chunk_count, dim, pinned_summary FROM sessions WHERE id = ?",
+            (session_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        created_at, last_used, count, dim, pinned_summary = row
+        chunks = [
+            text
+            for (text,) in self._db.execute(
+                "SELECT text FROM chunks WHERE session_id = ? AND idx < ? ORDER BY idx",
+                (session_id, count),
+            )
+        ]
+        lexical = BM25Index()
+        lexical.add(chunks)
+        dedup = ChunkDeduper()
+        dedup.add(chunks)
+        embeddings = EmbeddingMatrix()
+        if count:
+            rows = np.memmap(self._path(session_id), dtype=np.float32, mode="r", shape=(count, dim))
+            embeddings = EmbeddingMatrix.wrap(rows)
+        return Session(
+            id=session_id,
+            created_at=created_at,
+            last_used=last_used,
+            chunks=chunks,
+            embeddings=embeddings,
+            lexical=lexical,
+            dedup=dedup,
+            chunk_bytes=sum(sys.getsizeof(c) for c in chunks),
+            pinned_summary=pinned_summary,
+        )
+
+    def state(self, session_id: str) -> tuple[int, float] | None:
+        return self._db.execute(
+            "SELECT chunk_count, last_used FROM sessions WHERE id = ?", (session_id,)
+        ).fetchone()
+
+    def append(self, session: Session, chunks: list[str], rows: np.ndarray) -> int | None:
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._db.execute(
+                "SELECT chunk_count FROM sessions WHERE id = ?", (session.id,)
+            ).fetchone()
+            if row is None:
+                self._db.execute("ROLLBACK")
+                return None
+            base = row[0]
+            with open(self._path(session.id), "ab") as f:
+                # Drop rows left behind by an append whose transaction failed
+                f.truncate(base * rows.shape[1] * 4)
+                f.write(np.ascontiguousarray(rows, dtype=np.float32).tobytes())
+            self._db.executemany(
+                "INSERT OR REPLACE INTO chunks (session_id, idx, text) VALUES (?, ?, ?)",
+                [(session.id, base + i, text) for i, text in enumerate(chunks)],
+            )
+            self._db.execute(
+                "UPDATE sessions SET chunk_count = ?, dim = ?, last_used = ?, "
+                "pinned_summary = CASE WHEN pinned_summary = '' THEN ? ELSE pinned_summary END "
+                "WHERE id = ?",
+                (base + len(chunks), rows.shape[1], session.last_used, session.pinned_summary, session.id),
+            )
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        return base
+
+    def touch(self, session: Session) -> None:
+        if session.last_used - self._touched.get(session.id, 0.0) < self._TOUCH_INTERVAL:
+            return
+        self._touched[session.id] = session.last_used
+        self._db.execute(
+            "UPDATE sessions SET last_used = MAX(last_used, ?) WHERE id = ?",
+            (session.last_used, session.id),
+        )
+
+    def delete(self, session_id: str) -> None:
+        self._db.execute("DELETE FROM jobs WHERE session_id = ?", (session_id,))
+        self._db.execute("DELETE FROM chunks WHERE session_id = ?", (session_id,))
+        self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        self._path(session_id).unlink(missing_ok=True)
+        self._touched.pop(session_id, None)
+
+    def purge_expired(self, cutoff: float) -> int:
+        expired = [
+            sid for (sid,) in self._db.execute("SELECT id FROM sessions WHERE last_used < ?", (cutoff,))
+        ]
+        for sid in expired:
+            self.delete(sid)
+        self._db.execute("DELETE FROM jobs WHERE updated_at < ?", (cutoff,))
+        return len(expired)
+
+    def save_job(self, kind: str, snapshot: dict) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO jobs (id, kind, session_id, snapshot, updated_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (snapshot["job_id"], kind, snapshot["session_id"], json.dumps(snapshot), time.time()),
+        )
+
+    def load_job(self, kind: str, job_id: str) -> tuple[dict, float] | None:
+        row = self._db.execute(
+            "SELECT snapshot, updated_at FROM jobs WHERE id = ? AND kind = ?", (job_id, kind)
+        ).fetchone()
+        return None if row is None else (json.loads(row[0]), row[1])
+
+    def close(self) -> None:
+        self._db.close()
+
+    def _path(self, session_id: str) -> Path:
+        return self._dir / "embeddings" / f"{session_id}.f32"
+
+
+def create_backend() -> MemorySessionBackend:
+    if config.session.backend == "memory":
+        return MemorySessionBackend()
+    if config.session.backend == "sqlite":
+        return SQLiteSessionBackend(config.session.data_dir)
+    raise ValueError(f"Unknown session backend: {config.session.backend!r}")
+
+
+# --------------------------------------------------------------------------- #
+# Store                                                                         #
+# --------------------------------------------------------------------------- #
 
 
 class SessionStore:
-    def __init__(self) -> None:
-        self._sessions: dict[str, Session] = {}
+    """Sessions bounded by an idle TTL and a per-worker memory budget.
+
+    Sessions are kept in LRU order; when adding a document pushes the total
+    over ``session.max_bytes`` the least recently used other sessions are
+    evicted. Expiry uses a lazy min-heap of deadlines instead of full scans.
+
+    With a persistent backend the LRU is only this worker's cache: evicted
+    sessions are reloaded on the next ``get``, and sessions changed by another
+    worker are refreshed when their stored chunk count moves on.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int | None = None,
+        backend: MemorySessionBackend | None = None,
+    ) -> None:
+        self._sessions: OrderedDict[str, Session] = OrderedDict()
+        self._expiry: list[tuple[float, str]] = []
+        self._max_bytes = max_bytes if max_bytes is not None else config.session.max_bytes
+        self._backend = backend if backend is not None else MemorySessionBackend()
+        self._bytes = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._loads = 0
         self._task: asyncio.Task | None = None
 
     def create(self) -> Session:
         session = Session(id=str(uuid.uuid4()))
-        self._sessions[session.id] = session
+        self._backend.create(session)
+        self._cache(session)
         return session
 
     def get(self, session_id: str) -> Session | None:
         session = self._sessions.get(session_id)
         if session is None:
+            session = self._backend.load(session_id)
+            if session is None:
+                return None
+            self._loads += 1
+            self._cache(session)
+        elif self._backend.persistent and not self._sync(session):
             return None
         if session.is_expired():
-            del self._sessions[session_id]
+            self._delete(session_id)
+            self._expirations += 1
             return None
         session.touch()
+        self._backend.touch(session)
+        self._sessions.move_to_end(session_id)
         return session
 
     def delete(self, session_id: str) -> None:
-        self._sessions.pop(session_id, None)
+        self._delete(session_id)
+
+    def add_document(
+        self,
+        session: Session,
+        chunks: list[str],
+        embeddings: list[list[float]] | np.ndarray,
+        summary: str = "",
+    ) -> bool:
+        """Attach chunks to a session, evicting LRU sessions to stay in budget.
+
+        ``summary`` becomes the session's pinned summary if it has none yet.
+        Returns ``False`` when the session was deleted or evicted meanwhile.
+        """
+        if self._sessions.get(session.id) is not session:
+            # A persistent session dropped from this worker's cache still exists
+            if not self._backend.persistent or self._backend.state(session.id) is None:
+                return False
+            self._cache(session)
+        if not chunks:
+            return True
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        before = session.nbytes
+        added_chunk_bytes = sum(sys.getsizeof(c) for c in chunks)
+        if before + added_chunk_bytes + embeddings.nbytes > self._max_bytes:
+            raise SessionTooLarge("Session exceeds the AI service memory budget")
+        session.chunks.extend(chunks)
+        session.chunk_bytes += added_chunk_bytes
+        session.embeddings.append(embeddings)
+        session.lexical.add(chunks)
+        session.dedup.add(chunks)
+        if not session.pinned_summary:
+            session.pinned_summary = summary
+        session.touch()
+
+        base = self._backend.append(session, chunks, session.embeddings.matrix[-len(chunks) :])
+        if base is None:
+            self._remove(session.id)
+            return False
+        self._bytes += session.nbytes - before
+        if base != len(session.chunks) - len(chunks):
+            # Another worker appended to this session too; take the stored order
+            self._sync(session, force=True)
+        self._sessions.move_to_end(session.id)
+        self._evict(keep=session.id)
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "backend": self._backend.name,
+            "sessions": len(self._sessions),
+            "bytes": self._bytes,
+            "max_bytes": self._max_bytes,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+            "loads": self._loads,
+        }
+
+    @property
+    def backend(self) -> MemorySessionBackend:
+        return self._backend
+
+    def close(self) -> None:
+        self._backend.close()
+
+    def _cache(self, session: Session) -> None:
+        # A reloaded copy may already be cached; drop its bytes before replacing it
+        self._remove(session.id)
+        self._sessions[session.id] = session
+        self._bytes += session.nbytes
+        heapq.heappush(self._expiry, (session.expires_at(), session.id))
+        self._evict(keep=session.id)
+
+    def _sync(self, session: Session, force: bool = False) -> bool:
+        """Bring a cached session in line with the backend; ``False`` if it is gone."""
+        state = self._backend.state(session.id)
+        if state is None:
+            self._remove(session.id)
+            return False
+        count, last_used = state
+        session.last_used = max(session.last_used, last_used)
+        if force or count != len(session.chunks):
+            stored = self._backend.load(session.id)
+            if stored is None:
+                self._remove(session.id)
+                return False
+            before = session.nbytes
+            session.chunks = stored.chunks
+            session.embeddings = stored.embeddings
+            session.lexical = stored.lexical
+            session.dedup = stored.dedup
+            session.chunk_bytes = stored.chunk_bytes
+            session.pinned_summary = stored.pinned_summary
+            self._bytes += session.nbytes - before
+            self._loads += 1
+        return True
+
+    def _delete(self, session_id: str) -> None:
+        self._remove(session_id)
+        self._backend.delete(session_id)
+
+    def _remove(self, session_id: str) -> Session | None:
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._bytes -= session.nbytes
+        return session
+
+    def _evict(self, keep: str) -> None:
+        while self._bytes > self._max_bytes:
+            victim = next((sid for sid in self._sessions if sid != keep), None)
+            if victim is None:
+                break
+            self._remove(victim)
+            self._evictions += 1
+
+    def _expire(self) -> None:
+        now = time.time()
+        while self._expiry and self._expiry[0][0] <= now:
+            _, sid = heapq.heappop(self._expiry)
+            session = self._sessions.get(sid)
+            if session is None:
+                continue
+            if self._backend.persistent and not self._sync(session):
+                continue
+            if session.is_expired():
+                self._delete(sid)
+                self._expirations += 1
+            else:
+                # Touched since the deadline was pushed — reschedule
+                heapq.heappush(self._expiry, (session.expires_at(), sid))
+        # Sessions idle in every worker, including ones never loaded here
+        self._expirations += self._backend.purge_expired(now - config.session.ttl_seconds)
 
     async def start_cleanup_task(self) -> None:
         self._task = asyncio.create_task(self._cleanup_loop())
@@ -58,9 +467,7 @@ class SessionStore:
     async def _cleanup_loop(self) -> None:
         while True:
             await asyncio.sleep(300)
-            expired = [sid for sid, s in list(self._sessions.items()) if s.is_expired()]
-            for sid in expired:
-                del self._sessions[sid]
+            self._expire()
 
 
-session_store = SessionStore()
+session_store = SessionStore(backend=create_backend())
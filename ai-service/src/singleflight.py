@@ -0,0 +1,253 @@
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+Disconnected = Callable[[], Awaitable[bool]]
+ErrorItem = Callable[[Exception], Any]
+
+# How often a subscriber waiting for output checks whether its client left
+_DISCONNECT_POLL_SECONDS = 1.0
+
+
+class SharedStream:
+    """Runs one producer and fans its items out to every subscriber.
+
+    Late subscribers first replay the items produced so far, then follow the
+    live stream, so everyone receives the same sequence. If the producer
+    fails, ``on_error(exc)`` becomes the last item so subscribers learn why
+    the stream ended.
+    """
+
+    def __init__(self, source: AsyncIterator[Any], on_error: ErrorItem | None = None) -> None:
+        self._items: list[Any] = []
+        self._final: Any = None
+        self._done = False
+        self._changed = asyncio.Event()
+        self._on_done: list[Callable[[], None]] = []
+        self._on_error = on_error
+        self.subscribers = 0
+        self.task = asyncio.create_task(self._pump(source))
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def add_done_callback(self, callback: Callable[[], None]) -> None:
+        self._on_done.append(callback)
+
+    def subscribe(self, is_disconnected: Disconnected | None = None) -> "Subscription":
+        """Follow the stream; stops early once ``is_disconnected()`` reports the client gone.
+
+        When the last subscriber leaves before the producer finishes, the
+        producer is cancelled so no one keeps paying for unread output.
+        """
+        return Subscription(self, is_disconnected)
+
+    async def _follow(self, subscription: "Subscription") -> AsyncIterator[Any]:
+        self.subscribers += 1
+        try:
+            sent = 0
+            while True:
+                while sent < len(self._items) and not subscription.ended:
+                    yield self._items[sent]
+                    sent += 1
+                if subscription.ended:
+                    if subscription.final is not None:
+                        yield subscription.final
+                    return
+                if self._done:
+                    return
+                if subscription.is_disconnected is None:
+                    await self._changed.wait()
+                    continue
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=_DISCONNECT_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    if await subscription.is_disconnected():
+                        return
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self._done:
+                self.task.cancel()
+
+    async def _pump(self, source: AsyncIterator[Any]) -> None:
+        try:
+            async for item in source:
+                self._items.append(item)
+                self._notify()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.exception("Shared stream producer failed")
+            if self._on_error is not None and self._final is None:
+                self._final = self._on_error(exc)
+        finally:
+            if self._final is not None:
+                self._items.append(self._final)
+            self._done = True
+            self._notify()
+            for callback in self._on_done:
+                callback()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+
+class Subscription:
+    """One subscriber's view of a ``SharedStream``.
+
+    ``end`` stops this subscriber alone; the producer keeps running for the
+    others and is only cancelled if this was its last subscriber.
+    """
+
+    def __init__(self, shared: SharedStream, is_disconnected: Disconnected | None) -> None:
+        self.shared = shared
+        self.is_disconnected = is_disconnected
+        self.final: Any = None
+        self.ended = False
+
+    def __aiter__(self) -> AsyncIterator[Any]:
+        return self.shared._follow(self)
+
+    def end(self, final: Any = None) -> None:
+        """Stop following; ``final`` becomes the last item this subscriber receives."""
+        if not self.ended:
+            self.ended = True
+            self.final = final
+            self.shared._notify()
+
+
+class SingleFlight:
+    """Coalesces identical concurrent work by key.
+
+    ``call`` shares one awaitable result between concurrent callers and
+    ``stream`` shares one producer between concurrent SSE subscribers. Keys are
+    released as soon as the work completes; completed results are the job of
+    the caches, not of this class.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[str, asyncio.Future] = {}
+        self._streams: dict[str, SharedStream] = {}
+        self.coalesced_calls = 0
+        self.coalesced_streams = 0
+
+    async def call(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(factory())
+            self._calls[key] = future
+            future.add_done_callback(lambda _: self._release(self._calls, key, future))
+        else:
+            self.coalesced_calls += 1
+        # Shield so one caller going away does not cancel the shared work
+        return await asyncio.shield(future)
+
+    def stream(
+        self,
+        key: str,
+        factory: Callable[[], AsyncIterator[Any]],
+        is_disconnected: Disconnected | None = None,
+        on_error: ErrorItem | None = None,
+    ) -> Subscription:
+        shared = self._streams.get(key)
+        if shared is None or shared.done:
+            shared = SharedStream(factory(), on_error)
+            self._streams[key] = shared
+            shared.add_done_callback(lambda: self._release(self._streams, key, shared))
+        else:
+            self.coalesced_streams += 1
+        return shared.subscribe(is_disconnected)
+
+    def shared(self, key: str) -> SharedStream | None:
+        return self._streams.get(key)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight_calls": len(self._calls),
+            "in_flight_streams": len(self._streams),
+            "coalesced_calls": self.coalesced_calls,
+            "coalesced_streams": self.coalesced_streams,
+        }
+
+    @staticmethod
+    def _release(registry: dict, key: str, value: object) -> None:
+        if registry.get(key) is value:
+            del registry[key]
+
+
+class LatestWins:
+    """Tracks the newest request per key so older ones can be dropped.
+
+    Requests ``claim`` a key with a fingerprint of their inputs and must
+    ``release`` it once they return; identical requests share a claim so they
+    can still coalesce. A request whose claim was replaced gives up before
+    doing more work, and ``attach`` ends the subscriptions of the requests it
+    replaced. Their shared generation keeps running for anyone else following it.
+    """
+
+    def __init__(self) -> None:
+        # key -> [fingerprint of the newest request, requests holding it]
+        self._claims: dict[Hashable, list] = {}
+        # key -> (fingerprint, subscriptions of the requests holding it)
+        self._subscriptions: dict[Hashable, tuple[str, list[Subscription]]] = {}
+        self.superseded = 0
+
+    def claim(self, key: Hashable, fingerprint: str) -> None:
+        current = self._claims.get(key)
+        if current is not None and current[0] == fingerprint:
+            current[1] += 1
+        else:
+            self._claims[key] = [fingerprint, 1]
+
+    def still_latest(self, key: Hashable, fingerprint: str) -> bool:
+        """Whether ``fingerprint`` is the newest claim; counts it as superseded if not."""
+        current = self._claims.get(key)
+        if current is not None and current[0] == fingerprint:
+            return True
+        self.superseded += 1
+        return False
+
+    def release(self, key: Hashable, fingerprint: str) -> None:
+        current = self._claims.get(key)
+        if current is not None and current[0] == fingerprint:
+            current[1] -= 1
+            if current[1] <= 0:
+                del self._claims[key]
+
+    def attach(
+        self, key: Hashable, fingerprint: str, subscription: Subscription | None, final: Any
+    ) -> None:
+        """Track ``subscription`` for ``key``, ending older requests' subscriptions with ``final``.
+
+        ``subscription`` is ``None`` when the latest request needs no
+        generation (e.g. a cache hit); older requests are still ended.
+        """
+        previous = self._subscriptions.get(key)
+        if previous is None or previous[0] != fingerprint:
+            if previous is not None:
+                for older in previous[1]:
+                    if not older.ended and not older.shared.done:
+                        older.end(final)
+                        self.superseded += 1
+            previous = (fingerprint, [])
+            self._subscriptions[key] = previous
+        if subscription is not None:
+            previous[1].append(subscription)
+            subscription.shared.add_done_callback(lambda: self._on_done(key, subscription))
+        elif not previous[1]:
+            del self._subscriptions[key]
+
+    def stats(self) -> dict:
+        return {"tracked": len(self._subscriptions), "superseded": self.superseded}
+
+    def _on_done(self, key: Hashable, subscription: Subscription) -> None:
+        current = self._subscriptions.get(key)
+        if current is not None and subscription in current[1]:
+            current[1].remove(subscription)
+            if not current[1]:
+                del self._subscriptions[key]
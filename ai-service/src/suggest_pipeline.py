@@ -0,0 +1,370 @@
+import asyncio
+import hashlib
+import json
+import logging
+import textwrap
+from dataclasses import dataclass
+from typing import AsyncIterator
+
+import httpx
+import numpy as np
+from pydantic import BaseModel
+
+from src.answer_selection import answers_fit, select_previous_answers
+from src.config import config
+from src.context_builder import AssembledContext, assemble_context, count_tokens
+from src.document_pipeline import RetrievedChunk, retrieve, retrieve_hybrid
+from src.embedding_cache import text_hash
+from src.ollama_client import OllamaError, ollama
+from src.question_embeddings import embed_question
+from src.scheduler import QueueFull, Ticket, caller_priority, scheduler
+from src.session_store import Session
+from src.singleflight import Disconnected, SingleFlight, Subscription
+from src.suggestion_cache import pregenerated_fingerprint, suggestion_cache, suggestion_fingerprint
+from src.suggestion_parser import SuggestionEvent, SuggestionStreamParser
+
+logger = logging.getLogger(__name__)
+
+# Events that describe one delivery of a reply rather than the reply itself
+STREAM_EVENTS = frozenset({"queue", "sources", "done", "error", "superseded"})
+
+suggest_flights = SingleFlight()
+# Generations by cache key, so a caller joining one can promote its queued ticket
+_generation_tickets: dict[str, Ticket] = {}
+
+
+class SuggestRequest(BaseModel):
+    question_text: str
+    question_identifier: str | None = None
+    previous_answers: dict[str, str] = {}
+    study_metadata: dict[str, str | None] = {}
+    current_draft: str | None = None
+    # Skip the suggestion cache and generate a fresh reply
+    regenerate: bool = False
+
+
+@dataclass(slots=True)
+class PreparedSuggestion:
+    messages: list[dict]
+    usage: dict
+    cache_key: str
+    # Excerpts of the retrieved chunks, sent to the client before generation
+    sources: list[dict]
+    session: Session
+    # Hash of the system prefix; empty with the inline prompt layout
+    prefix_hash: str = ""
+
+
+def request_key(session_id: str, body: SuggestRequest) -> str:
+    payload = json.dumps(
+        [session_id, body.model_dump(exclude={"regenerate"})], sort_keys=True
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def prepare_suggestion(
+    session: Session,
+    body: SuggestRequest,
+    query_embedding: np.ndarray | None = None,
+    contexts: dict[tuple[int, ...], AssembledContext] | None = None,
+    lexical_only: bool = False,
+) -> PreparedSuggestion:
+    """Retrieve context for ``body`` and build its prompt and cache key.
+
+    Batch callers pass a precomputed ``query_embedding`` and a shared
+    ``contexts`` memo so questions retrieving the same chunks reuse one
+    assembled context; ``lexical_only`` skips the query embedding entirely.
+    """
+    answers_budget = config.prompt.previous_answers_tokens
+    needs_ranking = not answers_fit(body.previous_answers, answers_budget)
+    if query_embedding is None and not lexical_only and (session.chunks or needs_ranking):
+        query_embedding = await _embed_query(body)
+
+    # Retrieve relevant chunks and pack them into the context token budget
+    context = AssembledContext(text="", tokens=0, chunks=[])
+    retrieval = None
+    if session.chunks:
+        top_chunks, retrieval = _retrieve(session, body, query_embedding)
+        memo_key = tuple(c.index for c in top_chunks)
+        if contexts is not None and memo_key in contexts:
+            context = contexts[memo_key]
+        else:
+            context = assemble_context(top_chunks, config.retrieval.context_tokens)
+            if contexts is not None:
+                contexts[memo_key] = context
+
+    answers = await select_previous_answers(
+        body.previous_answers,
+        query_embedding,
+        answers_budget,
+        config.prompt.answer_summary_tokens,
+    )
+    usage = {
+        "context_tokens": context.tokens,
+        "retrieval": retrieval,
+        "answer_tokens": answers.tokens,
+        "answers_omitted": answers.omitted,
+    }
+    prefix_hash = ""
+    if config.prompt.layout == "inline":
+        prompt = build_prompt(body, context.text, answers.render())
+        messages = [{"role": "user", "content": prompt}]
+        usage["prompt_tokens"] = count_tokens(prompt)
+    else:
+        prefix = build_prefix(body, session.pinned_summary)
+        suffix = build_suffix(body, context.text, answers.render())
+        messages = [{"role": "system", "content": prefix}, {"role": "user", "content": suffix}]
+        prefix_tokens = count_tokens(prefix)
+        prefix_hash = text_hash(prefix)
+        usage.update(prompt_tokens=prefix_tokens + count_tokens(suffix), prefix_tokens=prefix_tokens)
+
+    cache_key = suggestion_fingerprint(
+        body.question_text,
+        [text_hash(c.text) for c in context.chunks],
+        body.study_metadata,
+        {"full": answers.full, "abridged": answers.abridged},
+        body.current_draft,
+        prefix_hash,
+    )
+    return PreparedSuggestion(
+        messages=messages,
+        usage=usage,
+        cache_key=cache_key,
+        sources=[_source(c) for c in context.chunks],
+        session=session,
+        prefix_hash=prefix_hash,
+    )
+
+
+def pregenerated_key(session: Session, body: SuggestRequest) -> str:
+    return pregenerated_fingerprint(
+        session.id, len(session.chunks), body.question_text, body.study_metadata
+    )
+
+
+def _source(chunk: RetrievedChunk) -> dict:
+    limit = config.suggest.source_excerpt_chars
+    excerpt = chunk.text if len(chunk.text) <= limit else chunk.text[:limit].rsplit(" ", 1)[0] + "…"
+    return {"index": chunk.index, "excerpt": excerpt, "score": round(chunk.score, 4)}
+
+
+async def _embed_query(body: SuggestRequest) -> np.ndarray | None:
+    """Query embedding for ``body``; ``None`` in hybrid mode if it is unavailable."""
+    if config.retrieval.mode == "vector":
+        return await embed_question(body.question_identifier, body.question_text)
+    try:
+        return await asyncio.wait_for(
+            embed_question(body.question_identifier, body.question_text),
+            timeout=config.retrieval.embed_timeout_seconds,
+        )
+    except (asyncio.TimeoutError, OllamaError, QueueFull) as exc:
+        logger.warning("Query embedding unavailable, using BM25 only: %r", exc)
+        return None
+
+
+def _retrieve(
+    session: Session,
+    body: SuggestRequest,
+    query_embedding: np.ndarray | None,
+) -> tuple[list[RetrievedChunk], str]:
+    """Top chunks for ``body`` and the retrieval mode that produced them."""
+    top_k = config.retrieval.top_k
+    if config.retrieval.mode == "vector" and query_embedding is not None:
+        return retrieve(query_embedding, session.embeddings, session.chunks, top_k), "vector"
+    top_chunks = retrieve_hybrid(
+        body.question_text,
+        query_embedding,
+        session.embeddings,
+        session.lexical,
+        session.chunks,
+        top_k,
+    )
+    return top_chunks, "hybrid" if query_embedding is not None else "lexical"
+
+
+_INSTRUCTIONS = "You are an expert clinical trial document assistant."
+
+_RESPONSE_SCHEMA = textwrap.dedent("""
+    Respond ONLY with a valid JSON object — no prose before or after — using this exact schema:
+    {
+      "guidance": "<one short paragraph explaining what a good answer should cover>",
+      "suggestions": [
+        {
+          "rank": 1,
+          "text": "<suggested answer text>",
+          "rationale": "<one sentence explaining why>",
+          "sources": ["<brief excerpt from reference doc that supports this>"]
+        }
+      ]
+    }
+
+    Provide 1 to 3 suggestions ranked by relevance. Keep each suggestion concise.
+""").strip()
+
+
+def build_prefix(body: SuggestRequest, pinned_summary: str) -> str:
+    """System message shared by every question of a session.
+
+    Only inputs that stay fixed while a user works through a document belong
+    here; anything per-question goes in ``build_suffix`` so the prefix stays
+    byte-identical and Ollama can reuse its KV cache.
+    """
+    meta = "\n".join(f"- {k}: {v}" for k, v in body.study_metadata.items() if v) or "None"
+    parts = [_INSTRUCTIONS, _RESPONSE_SCHEMA, f"## Study metadata\n{meta}"]
+    if pinned_summary:
+        parts.append(f"## Document overview\n{pinned_summary}")
+    return "\n\n".join(parts)
+
+
+def build_suffix(body: SuggestRequest, context_text: str, answers_text: str) -> str:
+    """User message with the retrieved context and the current question."""
+    ctx = context_text or "No reference documents uploaded."
+    draft = _draft(body)
+    parts = [
+        f"## Reference documents\n{ctx}",
+        f"## Previous answers in this document\n{answers_text}",
+        f"## Current question\n{body.question_text}",
+    ]
+    if draft:
+        parts.append(f'## User\'s current draft\n"""{draft}"""')
+    parts.append(f"{_constraint(draft)}\nRespond with the JSON object only.")
+    return "\n\n".join(parts)
+
+
+def _draft(body: SuggestRequest) -> str | None:
+    return body.current_draft.strip() if body.current_draft and body.current_draft.strip() else None
+
+
+def _constraint(draft: str | None) -> str:
+    if draft:
+        return (
+            "Each suggestion must build upon, complete, or refine the user's current draft — "
+            "it must be coherent with what the user has already written and must not contradict it."
+        )
+    return "Each suggestion must be relevant to the question and consistent with the study context."
+
+
+def build_prompt(body: SuggestRequest, context_text: str, answers_text: str) -> str:
+    """Single-message prompt used by the ``inline`` layout."""
+    meta = "\n".join(f"- {k}: {v}" for k, v in body.study_metadata.items() if v) or "None"
+    ctx = context_text or "No reference documents uploaded."
+    draft = _draft(body)
+
+    parts = [
+        textwrap.dedent(f"""
+            You are an expert clinical trial document assistant.
+
+            ## Reference documents
+            {ctx}
+
+            ## Study metadata
+            {meta}
+
+            ## Previous answers in this document
+            {answers_text}
+
+            ## Current question
+            {body.question_text}
+        """).strip()
+    ]
+
+    if draft:
+        parts.append(textwrap.dedent(f"""
+            ## User's current draft
+            \"\"\"{draft}\"\"\"
+        """).strip())
+
+    parts.append(f"{_RESPONSE_SCHEMA}\n{_constraint(draft)}")
+
+    return "\n\n".join(parts)
+
+
+async def generate_events(prepared: PreparedSuggestion, ticket: Ticket) -> AsyncIterator[SuggestionEvent]:
+    """Wait for a generation slot, then yield typed events as the reply streams in.
+
+    ``queue`` events report the wait; the completed reply is stored in the
+    suggestion cache. Raises ``OllamaError`` if generation fails.
+    """
+    parser = SuggestionStreamParser()
+    events: list[SuggestionEvent] = []
+    metrics: dict = {}
+    try:
+        async for status in ticket.wait():
+            yield "queue", status
+        if prepared.prefix_hash:
+            # Ollama keeps the previous prompt's KV cache, so a prefix it was just
+            # sent is not prefilled again; only count prompts actually sent
+            prepared.usage["prefix_reused"] = prepared.session.prefix_hash == prepared.prefix_hash
+            prepared.session.prefix_hash = prepared.prefix_hash
+        async for token in ollama.chat_stream(prepared.messages, metrics):
+            for event in parser.feed(token):
+                events.append(event)
+                yield event
+    except asyncio.CancelledError:
+        # Client gone: leaving the stream closes the Ollama request and frees the slot
+        ticket.cancel()
+        raise
+    finally:
+        ticket.release()
+    if "prompt_eval_count" in metrics:
+        # Tokens Ollama actually prefilled; lower than prompt_tokens on a prefix hit
+        prefill = metrics["prompt_eval_count"]
+        prepared.usage["prefill_tokens"] = prefill
+        prepared.usage["prefill_avoided_tokens"] = max(0, prepared.usage["prompt_tokens"] - prefill)
+
+    for event in parser.finish():
+        events.append(event)
+        yield event
+
+    # Raw-text fallbacks are not worth replaying
+    if any(name == "suggestion" for name, _ in events):
+        suggestion_cache.put(prepared.cache_key, events)
+
+
+def stream_generation(
+    prepared: PreparedSuggestion,
+    is_disconnected: Disconnected | None = None,
+) -> Subscription:
+    """Follow the generation for ``prepared``, starting it unless one is in flight.
+
+    Suggest calls and pregeneration share one generation per cache key. The
+    stream opens with ``sources`` and ends with ``done`` or ``error``; an
+    interactive caller joining a queued bulk generation promotes its ticket.
+    Raises ``QueueFull`` if a new generation cannot be queued.
+    """
+    ticket = _generation_tickets.get(prepared.cache_key)
+    if ticket is not None:
+        ticket.promote(caller_priority())
+    return suggest_flights.stream(
+        prepared.cache_key,
+        lambda: _start_generation(prepared),
+        is_disconnected=is_disconnected,
+        on_error=generation_error,
+    )
+
+
+def generation_error(exc: Exception) -> SuggestionEvent:
+    return "error", {"detail": str(exc) or f"Generation failed: {type(exc).__name__}"}
+
+
+def _start_generation(prepared: PreparedSuggestion) -> AsyncIterator[SuggestionEvent]:
+    # Queue before the stream starts so a full queue is a real 429
+    ticket = scheduler.submit(scheduler.generate)
+    return _generation_stream(prepared, ticket)
+
+
+async def _generation_stream(prepared: PreparedSuggestion, ticket: Ticket) -> AsyncIterator[SuggestionEvent]:
+    key = prepared.cache_key
+    _generation_tickets[key] = ticket
+    try:
+        yield "sources", {"sources": prepared.sources}
+        try:
+            async for event in generate_events(prepared, ticket):
+                yield event
+        except (OllamaError, httpx.HTTPError) as exc:
+            yield generation_error(exc)
+            return
+        yield "done", {**prepared.usage, "cached": False}
+    finally:
+        if _generation_tickets.get(key) is ticket:
+            del _generation_tickets[key]
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+
+from src.config import config
+from src.suggestion_parser import SuggestionEvent
+
+
+def suggestion_fingerprint(
+    question_text: str,
+    chunk_hashes: list[str],
+    study_metadata: dict,
+    previous_answers: dict,
+    current_draft: str | None,
+    prefix_hash: str = "",
+) -> str:
+    """Hash every input that shapes a suggestion reply."""
+    payload = json.dumps(
+        {
+            "model": config.model.chat_model,
+            "question": question_text,
+            "chunks": chunk_hashes,
+            "metadata": study_metadata,
+            "previous": previous_answers,
+            "draft": (current_draft or "").strip(),
+            "prefix": prefix_hash,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def pregenerated_fingerprint(
+    session_id: str,
+    chunk_count: int,
+    question_text: str,
+    study_metadata: dict,
+) -> str:
+    """Key for a reply pre-generated for a question, whatever was answered since.
+
+    Requests without a draft fall back to it when their exact fingerprint
+    misses, e.g. once earlier questions have been answered.
+    """
+    payload = json.dumps(
+        {
+            "model": config.model.chat_model,
+            "session": session_id,
+            "chunks": chunk_count,
+            "question": question_text,
+            "metadata": study_metadata,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SuggestionCache:
+    """Completed suggestion events by input fingerprint, with TTL and LRU bound."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+        self._max_entries = max_entries
+        self._ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, list[SuggestionEvent]]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> list[SuggestionEvent] | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.time():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: str, events: list[SuggestionEvent]) -> None:
+        self._entries[key] = (time.time() + self._ttl_seconds, events)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self._max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+suggestion_cache = SuggestionCache(
+    max_entries=config.cache.suggestion_max_entries,
+    ttl_seconds=config.cache.suggestion_ttl_seconds,
+)
@@ -0,0 +1,134 @@
+import json
+from typing import Any
+
+SuggestionEvent = tuple[str, dict[str, Any]]
+
+
+def strip_code_fences(raw: str) -> str:
+    """Remove markdown code fences the model may wrap its JSON reply in."""
+    clean = raw.strip()
+    if clean.startswith("```"):
+        lines = clean.splitlines()
+        clean = "\n".join(l for l in lines if not l.startswith("```")).strip()
+    return clean
+
+
+class SuggestionStreamParser:
+    """Incremental parser for the streamed ``{"guidance", "suggestions"}`` reply.
+
+    Tokens are fed as they arrive from the model. ``guidance`` is emitted as soon
+    as its string value closes and every element of ``suggestions`` is emitted the
+    moment its object closes, without waiting for the rest of the reply. Anything
+    before the first ``{`` (such as a code fence) is ignored.
+    """
+
+    def __init__(self) -> None:
+        self._buf = ""
+        self._pos = 0
+        self._stack: list[str] = []
+        self._started = False
+        self._closed = False
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._expect_key = False
+        self._key: str | None = None
+        self._item_start = -1
+        self.emitted = 0
+
+    @property
+    def raw(self) -> str:
+        return self._buf
+
+    def feed(self, text: str) -> list[SuggestionEvent]:
+        self._buf += text
+        events: list[SuggestionEvent] = []
+        buf = self._buf
+        while self._pos < len(buf) and not self._closed:
+            i = self._pos
+            c = buf[i]
+            self._pos += 1
+
+            if not self._started:
+                if c == "{":
+                    self._started = True
+                    self._stack.append(c)
+                    self._expect_key = True
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    self._on_string(buf[self._string_start : i + 1], events)
+                continue
+
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+            elif c in "{[":
+                self._stack.append(c)
+                if (
+                    c == "{"
+                    and len(self._stack) == 3
+                    and self._stack[1] == "["
+                    and self._key == "suggestions"
+                ):
+                    self._item_start = i
+            elif c in "}]":
+                if c == "}" and len(self._stack) == 3 and self._item_start >= 0:
+                    self._on_suggestion(buf[self._item_start : i + 1], events)
+                    self._item_start = -1
+                if self._stack:
+                    self._stack.pop()
+                if not self._stack:
+                    self._closed = True
+            elif c == "," and len(self._stack) == 1:
+                self._expect_key = True
+
+        self.emitted += len(events)
+        return events
+
+    def finish(self) -> list[SuggestionEvent]:
+        """Flush after the stream ends, falling back to a full parse or raw text."""
+        if self.emitted:
+            return []
+        events: list[SuggestionEvent] = []
+        try:
+            result = json.loads(strip_code_fences(self._buf))
+        except json.JSONDecodeError:
+            result = None
+        if isinstance(result, dict):
+            guidance = result.get("guidance", "")
+            if guidance:
+                events.append(("guidance", {"text": guidance}))
+            for suggestion in result.get("suggestions", []):
+                events.append(("suggestion", suggestion))
+        elif self._buf.strip():
+            # Fallback: emit the raw text as guidance so the user sees something
+            events.append(("guidance", {"text": self._buf}))
+        self.emitted += len(events)
+        return events
+
+    def _on_string(self, literal: str, events: list[SuggestionEvent]) -> None:
+        if len(self._stack) != 1:
+            return
+        try:
+            value = json.loads(literal)
+        except json.JSONDecodeError:
+            return
+        if self._expect_key:
+            self._key = value
+            self._expect_key = False
+        elif self._key == "guidance" and value:
+            events.append(("guidance", {"text": value}))
+
+    def _on_suggestion(self, literal: str, events: list[SuggestionEvent]) -> None:
+        try:
+            suggestion = json.loads(literal)
+        except json.JSONDecodeError:
+            return
+        events.append(("suggestion", suggestion))
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+
+import httpx
+
+from src.config import config
+from src.ollama_client import OllamaError, ollama
+from src.scheduler import BULK, set_caller
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class ModelProbe:
+    name: str
+    latency_ms: float | None = None
+    checked_at: float | None = None
+    error: str | None = None
+
+    @property
+    def warm(self) -> bool:
+        return self.latency_ms is not None and self.error is None
+
+    def info(self, running: dict[str, str] | None) -> dict:
+        expires_at = None if running is None else running.get(_tagged(self.name))
+        return {
+            "name": self.name,
+            "resident": expires_at is not None,
+            "expires_at": expires_at,
+            "latency_ms": self.latency_ms,
+            "checked_at": self.checked_at,
+            "error": self.error,
+        }
+
+
+class ModelWarmer:
+    """Keeps the chat and embedding models loaded in Ollama.
+
+    At startup both models are loaded with a one-token generation and a
+    one-input embedding, then probed again every ``warmup.interval_seconds``
+    so they do not outlive ``model.keep_alive`` between requests. The
+    round-trip latency of the last probes is reported by ``/ai/ready``.
+    """
+
+    def __init__(self) -> None:
+        self.chat = ModelProbe(config.model.chat_model)
+        self.embed = ModelProbe(config.model.embed_model)
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if config.warmup.enabled:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def warm(self) -> bool:
+        set_caller("warmup", BULK)
+        await asyncio.gather(
+            self._probe(self.embed, lambda: ollama.embed("ping")),
+            # Outside the generate slots: a cold load would skew their hold-time estimate
+            self._probe(self.chat, ollama.probe_chat),
+        )
+        return self.chat.warm and self.embed.warm
+
+    async def readiness(self) -> dict:
+        """Residency of both models, as reported by Ollama, with the last probe latencies."""
+        running: dict[str, str] | None = None
+        error = None
+        try:
+            running = await ollama.running_models(config.warmup.ready_timeout_seconds)
+        except (OllamaError, httpx.HTTPError) as exc:
+            error = repr(exc)
+        models = {"chat": self.chat.info(running), "embed": self.embed.info(running)}
+        if not config.warmup.enabled:
+            # Nothing loads the models ahead of traffic, so only require Ollama to answer
+            ready = running is not None
+        else:
+            ready = all(m["resident"] and m["error"] is None for m in models.values())
+        return {"ready": ready, "models": models, "error": error}
+
+    async def _loop(self) -> None:
+        while True:
+            if await self.warm():
+                if config.warmup.interval_seconds <= 0:
+                    return
+                await asyncio.sleep(config.warmup.interval_seconds)
+            else:
+                await asyncio.sleep(config.warmup.retry_seconds)
+
+    async def _probe(self, probe: ModelProbe, run) -> None:
+        started = time.perf_counter()
+        try:
+            await run()
+        except (OllamaError, httpx.HTTPError) as exc:
+            probe.error = repr(exc)
+            logger.warning("Warm-up of %s failed: %s", probe.name, probe.error)
+        else:
+            probe.latency_ms = round((time.perf_counter() - started) * 1000, 1)
+            probe.error = None
+        probe.checked_at = time.time()
+
+
+def _tagged(model: str) -> str:
+    # /api/ps reports "nomic-embed-text" as "nomic-embed-text:latest"
+    return model if ":" in model else f"{model}:latest"
+
+
+model_warmer = ModelWarmer()
@@ -13,6 +13,8 @@ class Settings(BaseSettings):
     MONGODB_URI: str
     MONGODB_DB_NAME: str = "risktool"
     API_IAM_SERVER_URL: str | None = None
+    # Base URL of the AI service; question pool edits are sent there to precompute embeddings
+    API_AI_SERVICE_URL: str | None = None
     API_DEV_MODE: bool = False
     API_DEV_USER_ID: str = "dev-user"
     API_DEV_USERNAME: str = "dev"
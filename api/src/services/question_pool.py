@@ -1,14 +1,20 @@
+import logging
+
+import httpx
 from bson import ObjectId
 from bson.binary import Binary
 from datetime import datetime
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from pymongo import ReturnDocument
+from src.core.settings import settings
 from src.models.question_pool import (
     QuestionPool,
     QuestionPoolCreate,
     QuestionPoolUpdate,
 )
 
+logger = logging.getLogger(__name__)
+
 
 def _serialize_pool(doc: dict) -> QuestionPool:
     payload = {**doc}
@@ -19,6 +25,26 @@ def _serialize_pool(doc: dict) -> QuestionPool:
     return QuestionPool.model_validate(payload)
 
 
+async def _sync_ai_embeddings(pool_id: str, pool: QuestionPool | None) -> None:
+    """Have the AI service precompute (or drop) query embeddings for a pool's questions.
+
+    Best effort: without them the AI service embeds each question on request.
+    """
+    if not settings.API_AI_SERVICE_URL:
+        return
+    url = f"{settings.API_AI_SERVICE_URL.rstrip('/')}/ai/question-pools/{pool_id}/embeddings"
+    try:
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            if pool and pool.questions:
+                questions = [{"identifier": q.identifier, "text": q.text} for q in pool.questions]
+                response = await client.put(url, json={"questions": questions})
+            else:
+                response = await client.delete(url)
+            response.raise_for_status()
+    except httpx.HTTPError as exc:
+        logger.warning("Could not sync AI embeddings for question pool %s: %s", pool_id, exc)
+
+
 class QuestionPoolService:
     collection = "question_pools"
 
@@ -37,8 +63,9 @@ class QuestionPoolService:
         data = payload.model_dump()
         data["questionCount"] = len(data.get("questions", []))
         result = await db[self.collection].insert_one(data)
-        created = await db[self.collection].find_one({"_id": result.inserted_id})
-        return _serialize_pool(created)
+        created = _serialize_pool(await db[self.collection].find_one({"_id": result.inserted_id}))
+        await _sync_ai_embeddings(created.id, created)
+        return created
 
     async def update(self, db: AsyncIOMotorDatabase, pool_id: str, payload: QuestionPoolUpdate):
         update_data = {k: v for k, v in payload.model_dump().items() if v is not None}
@@ -51,10 +78,15 @@ class QuestionPoolService:
             {"$set": update_data},
             return_document=ReturnDocument.AFTER,
         )
-        return _serialize_pool(doc) if doc else None
+        pool = _serialize_pool(doc) if doc else None
+        if pool and "questions" in update_data:
+            await _sync_ai_embeddings(pool_id, pool)
+        return pool
 
     async def delete(self, db: AsyncIOMotorDatabase, pool_id: str):
         doc = await db[self.collection].find_one_and_delete({"_id": ObjectId(pool_id)})
+        if doc:
+            await _sync_ai_embeddings(pool_id, None)
         return _serialize_pool(doc) if doc else None
 
     async def clear_entries(self, db: AsyncIOMotorDatabase, pool_id: str):
@@ -63,6 +95,8 @@ class QuestionPoolService:
             {"$set": {"questions": [], "questionCount": 0}},
             return_document=ReturnDocument.AFTER,
         )
+        if doc:
+            await _sync_ai_embeddings(pool_id, None)
         return _serialize_pool(doc) if doc else None
 
     async def upload_docx(
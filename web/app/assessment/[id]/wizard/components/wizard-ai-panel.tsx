@@ -4,21 +4,32 @@ import { useState } from "react"
 import { Bot, ChevronDown, ChevronUp } from "lucide-react"
 import { Button } from "@/components/ui/button"
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card"
-import type { AiSuggestionEvent } from "@/lib/services/ai-service"
+import type { AiSource, AiSuggestionEvent } from "@/lib/services/ai-service"
 import type { AnswerProvenance } from "@/lib/types"
 
 interface WizardAiPanelProps {
   guidance: string
   suggestions: AiSuggestionEvent[]
+  sources: AiSource[]
+  retrievalOnly: boolean
   dismissed: Set<number>
   error: string | null
   onAccept: (text: string, provenance: AnswerProvenance) => void
   onDismiss: (rank: number) => void
 }
 
-export function WizardAiPanel({ guidance, suggestions, dismissed, error, onAccept, onDismiss }: WizardAiPanelProps) {
+export function WizardAiPanel({
+  guidance,
+  suggestions,
+  sources,
+  retrievalOnly,
+  dismissed,
+  error,
+  onAccept,
+  onDismiss,
+}: WizardAiPanelProps) {
   const [expanded, setExpanded] = useState(true)
-  const hasContent = !!guidance || suggestions.length > 0
+  const hasContent = !!guidance || suggestions.length > 0 || sources.length > 0 || retrievalOnly
 
   return (
     <Card className="border-dashed border-muted-foreground/30 bg-muted/20">
@@ -51,6 +62,12 @@ export function WizardAiPanel({ guidance, suggestions, dismissed, error, onAccep
 
       {hasContent && expanded && (
         <CardContent className="pt-0 space-y-3">
+          {retrievalOnly && (
+            <p className="text-xs text-muted-foreground">
+              The model is busy right now, so only the matching passages from your documents are
+              shown. Try Re-suggest in a moment for drafted answers.
+            </p>
+          )}
           {guidance && (
             <div className="text-xs text-muted-foreground bg-muted rounded p-2">
               {guidance}
@@ -95,6 +112,19 @@ export function WizardAiPanel({ guidance, suggestions, dismissed, error, onAccep
               </div>
             )
           )}
+          {sources.length > 0 && (
+            <div className="space-y-2">
+              <p className="text-xs font-medium text-muted-foreground">Sources</p>
+              {sources.map((source) => (
+                <blockquote
+                  key={source.index}
+                  className="border-l-2 pl-2 text-xs text-muted-foreground whitespace-pre-line"
+                >
+                  {source.excerpt}
+                </blockquote>
+              ))}
+            </div>
+          )}
         </CardContent>
       )}
     </Card>
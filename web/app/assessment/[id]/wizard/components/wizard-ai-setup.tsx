@@ -4,10 +4,11 @@ import { useRef, useState } from "react"
 import { Bot, Loader2, Paperclip, X } from "lucide-react"
 import { Button } from "@/components/ui/button"
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card"
-import { AiService } from "@/lib/services/ai-service"
+import { AiIngestionError, AiService, type AiIngestionJob } from "@/lib/services/ai-service"
 
 interface WizardAiSetupProps {
-  onConfirm: (sessionId: string | null) => void
+  /** ``jobIds`` are ingestion jobs still running; the wizard keeps showing their progress */
+  onConfirm: (sessionId: string | null, jobIds?: string[]) => void
 }
 
 export function WizardAiSetup({ onConfirm }: WizardAiSetupProps) {
@@ -15,6 +16,7 @@ export function WizardAiSetup({ onConfirm }: WizardAiSetupProps) {
   const [files, setFiles] = useState<File[]>([])
   const [loading, setLoading] = useState(false)
   const [error, setError] = useState<string | null>(null)
+  const [progress, setProgress] = useState<Record<string, AiIngestionJob>>({})
   const fileInputRef = useRef<HTMLInputElement>(null)
 
   const handleFileChange = (e: React.ChangeEvent<HTMLInputElement>) => {
@@ -35,19 +37,53 @@ export function WizardAiSetup({ onConfirm }: WizardAiSetupProps) {
 
     setLoading(true)
     setError(null)
+    setProgress({})
 
+    let sessionId: string | null = null
     try {
-      const sessionId = await AiService.createSession()
+      sessionId = await AiService.createSession()
+      const jobIds: string[] = []
       for (const file of files) {
-        await AiService.uploadDocument(sessionId, file)
+        jobIds.push(await AiService.uploadDocument(sessionId, file))
       }
-      onConfirm(sessionId)
-    } catch {
-      setError("Could not connect to AI service. You can continue without AI assistance.")
+      // Uploads return as soon as the server accepts them. Start the wizard once every
+      // document has its first passages indexed; the rest keeps indexing in the background.
+      const id = sessionId
+      const following = new AbortController()
+      try {
+        await Promise.all(
+          jobIds.map(
+            (jobId) =>
+              new Promise<void>((resolve, reject) => {
+                AiService.waitForIngestion(
+                  id,
+                  jobId,
+                  (job) => {
+                    setProgress((prev) => ({ ...prev, [jobId]: job }))
+                    if (job.chunksEmbedded > 0) resolve()
+                  },
+                  following.signal
+                ).then(() => resolve(), reject)
+              })
+          )
+        )
+      } finally {
+        following.abort()
+      }
+      onConfirm(sessionId, jobIds)
+    } catch (err) {
+      if (sessionId) AiService.deleteSession(sessionId)
+      setError(
+        err instanceof AiIngestionError
+          ? `Could not index ${err.filename}: ${err.message}. Remove it or continue without AI assistance.`
+          : "Could not connect to AI service. You can continue without AI assistance."
+      )
       setLoading(false)
     }
   }
 
+  const indexing = Object.values(progress).filter((job) => job.status !== "done")
+
   return (
     <div className="container max-w-4xl py-8">
       <Card>
@@ -145,6 +181,17 @@ export function WizardAiSetup({ onConfirm }: WizardAiSetupProps) {
             </div>
           )}
 
+          {loading && indexing.length > 0 && (
+            <ul className="space-y-1 text-xs text-muted-foreground">
+              {indexing.map((job) => (
+                <li key={job.jobId}>
+                  Indexing {job.filename}
+                  {job.chunksTotal ? ` — ${job.chunksEmbedded}/${job.chunksTotal} passages` : "…"}
+                </li>
+              ))}
+            </ul>
+          )}
+
           {error && <p className="text-sm text-destructive">{error}</p>}
 
           <div className="flex gap-3">
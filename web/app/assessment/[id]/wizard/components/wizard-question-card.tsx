@@ -4,7 +4,12 @@ import { Button } from "@/components/ui/button"
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card"
 import { Textarea } from "@/components/ui/textarea"
 import type { AnswerProvenance, Question } from "@/lib/types"
-import { AiService, type AiSuggestionEvent, type SuggestParams } from "@/lib/services/ai-service"
+import {
+  AiService,
+  type AiSource,
+  type AiSuggestionEvent,
+  type SuggestParams,
+} from "@/lib/services/ai-service"
 import { WizardTableInput } from "./wizard-table-input"
 import { WizardAiPanel } from "./wizard-ai-panel"
 
@@ -28,11 +33,20 @@ interface WizardQuestionCardProps {
 interface AiState {
   guidance: string
   suggestions: AiSuggestionEvent[]
+  sources: AiSource[]
+  retrievalOnly: boolean
   loading: boolean
   error: string | null
 }
 
-const initialAiState: AiState = { guidance: "", suggestions: [], loading: false, error: null }
+const initialAiState: AiState = {
+  guidance: "",
+  suggestions: [],
+  sources: [],
+  retrievalOnly: false,
+  loading: false,
+  error: null,
+}
 
 export function WizardQuestionCard({
   currentQuestion,
@@ -54,6 +68,8 @@ export function WizardQuestionCard({
   const [draftAnswer, setDraftAnswer] = useState(answer)
   const [aiState, setAiState] = useState<AiState>(initialAiState)
   const [dismissed, setDismissed] = useState<Set<number>>(new Set())
+  // In-flight suggest request; aborting it lets the server cancel the generation
+  const suggestAbortRef = useRef<AbortController | null>(null)
 
   const normalizedQuestionInfo = question?.info?.trim()
   const isTable = question?.type === "table"
@@ -69,6 +85,10 @@ export function WizardQuestionCard({
   useEffect(() => {
     setAiState(initialAiState)
     setDismissed(new Set())
+    return () => {
+      suggestAbortRef.current?.abort()
+      suggestAbortRef.current = null
+    }
   }, [question?.id])
 
   const handleAnswerChange = (value: string) => {
@@ -87,28 +107,49 @@ export function WizardQuestionCard({
         }
       : null
 
-  const fetchSuggestion = async () => {
+  // Re-suggest passes regenerate so the server skips its cached reply
+  const fetchSuggestion = async (regenerate = false) => {
     if (!suggestParams || !aiSessionId) return
+    suggestAbortRef.current?.abort()
+    const controller = new AbortController()
+    suggestAbortRef.current = controller
     setAiState({ ...initialAiState, loading: true })
     setDismissed(new Set())
     try {
-      for await (const event of AiService.suggest(aiSessionId, suggestParams)) {
+      for await (const event of AiService.suggest(
+        aiSessionId,
+        { ...suggestParams, regenerate },
+        controller.signal,
+      )) {
+        if (controller.signal.aborted) return
         if (event.type === "guidance") {
           setAiState((prev) => ({ ...prev, guidance: event.text }))
         } else if (event.type === "suggestion") {
           setAiState((prev) => ({ ...prev, suggestions: [...prev.suggestions, event] }))
+        } else if (event.type === "sources") {
+          setAiState((prev) => ({ ...prev, sources: event.sources }))
         } else if (event.type === "done") {
-          setAiState((prev) => ({ ...prev, loading: false }))
+          setAiState((prev) => ({ ...prev, loading: false, retrievalOnly: event.retrievalOnly }))
         } else if (event.type === "error") {
           setAiState((prev) => ({ ...prev, loading: false, error: event.detail }))
         }
       }
+      // A stream that ends without "done" or "error" must not leave the spinner running
+      setAiState((prev) => (prev.loading ? { ...prev, loading: false } : prev))
     } catch {
+      // Replaced by a newer request or the card moved on: nothing to report
+      if (controller.signal.aborted) return
       setAiState((prev) => ({ ...prev, loading: false, error: "Failed to fetch suggestion." }))
+    } finally {
+      if (suggestAbortRef.current === controller) suggestAbortRef.current = null
     }
   }
 
-  const hasAiContent = !!aiState.guidance || aiState.suggestions.length > 0
+  const hasAiContent =
+    !!aiState.guidance ||
+    aiState.suggestions.length > 0 ||
+    aiState.sources.length > 0 ||
+    aiState.retrievalOnly
 
   return (
     <Card>
@@ -166,7 +207,7 @@ export function WizardQuestionCard({
                     size="sm"
                     variant="outline"
                     className="h-7 text-xs gap-1 bg-background"
-                    onClick={fetchSuggestion}
+                    onClick={() => fetchSuggestion(hasAiContent)}
                   >
                     <Sparkles className="h-3 w-3" />
                     {hasAiContent ? "Re-suggest" : "Suggest answer"}
@@ -181,12 +222,15 @@ export function WizardQuestionCard({
           <WizardAiPanel
             guidance={aiState.guidance}
             suggestions={aiState.suggestions}
+            sources={aiState.sources}
+            retrievalOnly={aiState.retrievalOnly}
             dismissed={dismissed}
             error={aiState.error}
             onAccept={(text, prov) => {
               setDraftAnswer(text)
               onAnswerChange(text)
               onProvenanceChange(prov)
+              suggestAbortRef.current?.abort()
               setAiState(initialAiState)
               requestAnimationFrame(() => {
                 textareaRef.current?.focus()
@@ -1,7 +1,7 @@
 "use client"
 
 import { useEffect, useState } from "react"
-import { AlertTriangle } from "lucide-react"
+import { AlertTriangle, Loader2 } from "lucide-react"
 import { useAssessmentWizard } from "./hooks"
 import {
   WizardAiSetup,
@@ -10,7 +10,7 @@ import {
   WizardQuestionCard,
   WizardQuestionMetadata,
 } from "./components"
-import { AiService } from "@/lib/services/ai-service"
+import { AiIngestionError, AiService, type AiIngestionJob } from "@/lib/services/ai-service"
 
 interface WizardPageClientProps {
   assessmentId: string
@@ -22,6 +22,10 @@ export function WizardPageClient({ assessmentId }: WizardPageClientProps) {
   const [phase, setPhase] = useState<Phase>("setup")
   const [aiSessionId, setAiSessionId] = useState<string | null>(null)
   const [aiUnavailable, setAiUnavailable] = useState(false)
+  // Documents still being indexed after the setup step let the wizard start
+  const [aiJobIds, setAiJobIds] = useState<string[]>([])
+  const [indexing, setIndexing] = useState<Record<string, AiIngestionJob>>({})
+  const [indexingError, setIndexingError] = useState<string | null>(null)
 
   const {
     answers,
@@ -68,8 +72,30 @@ export function WizardPageClient({ assessmentId }: WizardPageClientProps) {
     }
   }, [aiSessionId])
 
-  const handleSetupConfirm = (sessionId: string | null) => {
+  // Follow the remaining indexing so suggestions are known to improve as it completes
+  useEffect(() => {
+    if (!aiSessionId || aiJobIds.length === 0) return
+    const controller = new AbortController()
+
+    for (const jobId of aiJobIds) {
+      AiService.waitForIngestion(
+        aiSessionId,
+        jobId,
+        (job) => setIndexing((prev) => ({ ...prev, [jobId]: job })),
+        controller.signal
+      ).catch((err) => {
+        if (controller.signal.aborted || !(err instanceof AiIngestionError)) return
+        setIndexingError(
+          `Could not finish indexing ${err.filename}: ${err.message}. Suggestions use the passages indexed so far.`
+        )
+      })
+    }
+    return () => controller.abort()
+  }, [aiSessionId, aiJobIds])
+
+  const handleSetupConfirm = (sessionId: string | null, jobIds: string[] = []) => {
     setAiSessionId(sessionId)
+    setAiJobIds(jobIds)
     setPhase("wizard")
   }
 
@@ -101,8 +127,32 @@ export function WizardPageClient({ assessmentId }: WizardPageClientProps) {
     studyQuestion: context.study.studyQuestion,
   }
 
+  const stillIndexing = Object.values(indexing).filter(
+    (job) => job.status !== "done" && job.status !== "failed"
+  )
+
   return (
     <div className="container max-w-4xl py-8">
+      {!aiUnavailable && stillIndexing.length > 0 && (
+        <div className="mb-4 space-y-1 rounded-md border bg-muted/50 px-4 py-2 text-xs text-muted-foreground">
+          {stillIndexing.map((job) => (
+            <p key={job.jobId} className="flex items-center gap-2">
+              <Loader2 className="h-3 w-3 shrink-0 animate-spin" />
+              Indexing {job.filename}
+              {job.chunksTotal ? ` — ${job.chunksEmbedded}/${job.chunksTotal} passages` : "…"}
+            </p>
+          ))}
+          <p>Suggestions improve as more of your documents are indexed.</p>
+        </div>
+      )}
+
+      {!aiUnavailable && indexingError && (
+        <div className="mb-4 flex items-center gap-2 rounded-md border border-yellow-200 bg-yellow-50 px-4 py-2 text-sm text-yellow-800">
+          <AlertTriangle className="h-4 w-4 shrink-0" />
+          {indexingError}
+        </div>
+      )}
+
       {aiUnavailable && (
         <div className="mb-4 flex items-center gap-2 rounded-md border border-yellow-200 bg-yellow-50 px-4 py-2 text-sm text-yellow-800">
           <AlertTriangle className="h-4 w-4 shrink-0" />
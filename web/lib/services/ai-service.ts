@@ -27,6 +27,10 @@ export interface AiSuggestionEvent {
 
 export interface AiDoneEvent {
   type: "done"
+  /** Replayed from the server-side suggestion cache */
+  cached: boolean
+  /** The model was busy, so the reply carries retrieved sources only */
+  retrievalOnly: boolean
 }
 
 export interface AiErrorEvent {
@@ -34,7 +38,59 @@ export interface AiErrorEvent {
   detail: string
 }
 
-export type AiSseEvent = AiGuidanceEvent | AiSuggestionEvent | AiDoneEvent | AiErrorEvent
+export interface AiQueueEvent {
+  type: "queue"
+  position: number
+  queueDepth: number
+  waitedSeconds: number
+}
+
+export interface AiSource {
+  index: number
+  excerpt: string
+  score: number
+}
+
+/** Retrieved reference excerpts, sent before (or, under load, instead of) suggestions */
+export interface AiSourcesEvent {
+  type: "sources"
+  sources: AiSource[]
+}
+
+/** A newer suggest call for the same question replaced this one */
+export interface AiSupersededEvent {
+  type: "superseded"
+}
+
+export type AiSseEvent =
+  | AiGuidanceEvent
+  | AiSuggestionEvent
+  | AiQueueEvent
+  | AiSupersededEvent
+  | AiSourcesEvent
+  | AiDoneEvent
+  | AiErrorEvent
+
+export interface AiIngestionJob {
+  jobId: string
+  status: "queued" | "parsing" | "embedding" | "done" | "failed" | string
+  error: string | null
+  filename: string
+  chunksTotal: number | null
+  chunksEmbedded: number
+  etaSeconds: number | null
+}
+
+/** An uploaded document could not be indexed (parse failure, empty document, page cap, ...) */
+export class AiIngestionError extends Error {
+  constructor(
+    readonly filename: string,
+    detail: string
+  ) {
+    super(detail)
+    this.name = "AiIngestionError"
+  }
+}
 
 export interface SuggestParams {
   questionText: string
@@ -42,6 +98,8 @@ export interface SuggestParams {
   previousAnswers: Record<string, string>
   studyMetadata: Record<string, string | null | undefined>
   currentDraft?: string
+  /** Bypass the server-side suggestion cache and generate a fresh reply */
+  regenerate?: boolean
 }
 
 export class AiService {
@@ -52,7 +110,8 @@ export class AiService {
     return data.session_id
   }
 
-  static async uploadDocument(sessionId: string, file: File): Promise<void> {
+  /** Starts a background ingestion job and returns its id; suggest can use chunks as they are indexed. */
+  static async uploadDocument(sessionId: string, file: File): Promise<string> {
     const form = new FormData()
     form.append("file", file)
     const response = await fetch(`${AI_BASE_URL}/sessions/${sessionId}/documents`, {
@@ -63,15 +122,60 @@ export class AiService {
       const text = await response.text().catch(() => "")
       throw new Error(`Document upload failed: ${text}`)
     }
+    const data = await response.json()
+    return data.job_id
+  }
+
+  /**
+   * Follows an ingestion job until it finishes and resolves with its final state.
+   * Throws AiIngestionError when the job fails; aborting ``signal`` stops following.
+   */
+  static async waitForIngestion(
+    sessionId: string,
+    jobId: string,
+    onProgress?: (job: AiIngestionJob) => void,
+    signal?: AbortSignal
+  ): Promise<AiIngestionJob> {
+    const response = await fetch(`${AI_BASE_URL}/sessions/${sessionId}/jobs/${jobId}/events`, {
+      signal,
+    })
+    if (!response.ok || !response.body) {
+      throw new Error(`Ingestion job status unavailable (${response.status})`)
+    }
+
+    let job: AiIngestionJob | null = null
+    for await (const block of _readSseBlocks(response.body)) {
+      const fields = _parseSseFields(block)
+      if (!fields) continue
+      const { eventType, payload } = fields
+      if (eventType === "progress") {
+        job = _toIngestionJob(payload)
+        onProgress?.(job)
+      } else if (eventType === "error") {
+        throw new AiIngestionError(job?.filename ?? "document", payload.detail ?? "Indexing failed")
+      } else if (eventType === "done") {
+        if (job?.status === "failed") {
+          throw new AiIngestionError(job.filename, job.error ?? "Indexing failed")
+        }
+        if (job) return job
+      }
+    }
+    throw new Error("Lost connection while the document was being indexed")
   }
 
   static async deleteSession(sessionId: string): Promise<void> {
     await fetch(`${AI_BASE_URL}/sessions/${sessionId}`, { method: "DELETE" }).catch(() => {})
   }
 
-  static async *suggest(sessionId: string, params: SuggestParams): AsyncGenerator<AiSseEvent> {
+  /** Streams suggestion events; aborting ``signal`` disconnects so the server stops generating. */
+  static async *suggest(
+    sessionId: string,
+    params: SuggestParams,
+    signal?: AbortSignal
+  ): AsyncGenerator<AiSseEvent> {
     const response = await fetch(`${AI_BASE_URL}/sessions/${sessionId}/suggest`, {
       method: "POST",
+      signal,
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({
         question_text: params.questionText,
@@ -81,6 +185,7 @@ export class AiService {
           Object.entries(params.studyMetadata).filter(([, v]) => v != null)
         ),
         current_draft: params.currentDraft || null,
+        regenerate: params.regenerate ?? false,
       }),
     })
 
@@ -94,28 +199,8 @@ export class AiService {
       return
     }
 
-    const reader = response.body.getReader()
-    const decoder = new TextDecoder()
-    let buffer = ""
-
-    while (true) {
-      const { done, value } = await reader.read()
-      if (done) break
-      buffer += decoder.decode(value, { stream: true })
-
-      // Process complete SSE events (delimited by double newline)
-      const parts = buffer.split("\n\n")
-      buffer = parts.pop() ?? ""
-
-      for (const part of parts) {
-        const event = _parseSseBlock(part)
-        if (event) yield event
-      }
-    }
-
-    // Flush remaining buffer
-    if (buffer.trim()) {
-      const event = _parseSseBlock(buffer)
+    for await (const block of _readSseBlocks(response.body)) {
+      const event = _parseSseBlock(block)
       if (event) yield event
     }
   }
@@ -132,7 +217,28 @@ export class AiService {
   }
 }
 
-function _parseSseBlock(block: string): AiSseEvent | null {
+async function* _readSseBlocks(body: ReadableStream<Uint8Array>): AsyncGenerator<string> {
+  const reader = body.getReader()
+  const decoder = new TextDecoder()
+  let buffer = ""
+
+  while (true) {
+    const { done, value } = await reader.read()
+    if (done) break
+    buffer += decoder.decode(value, { stream: true })
+
+    // Process complete SSE events (delimited by double newline)
+    const parts = buffer.split("\n\n")
+    buffer = parts.pop() ?? ""
+    yield* parts
+  }
+
+  // Flush remaining buffer
+  if (buffer.trim()) yield buffer
+}
+
+// eslint-disable-next-line @typescript-eslint/no-explicit-any
+function _parseSseFields(block: string): { eventType: string; payload: any } | null {
   let eventType = ""
   let dataLine = ""
 
@@ -147,14 +253,46 @@ function _parseSseBlock(block: string): AiSseEvent | null {
   if (!eventType || !dataLine) return null
 
   try {
-    const payload = JSON.parse(dataLine)
-    if (eventType === "guidance") return { type: "guidance", text: payload.text }
-    if (eventType === "suggestion") return { type: "suggestion", ...payload }
-    if (eventType === "done") return { type: "done" }
-    if (eventType === "error") return { type: "error", detail: payload.detail }
+    return { eventType, payload: JSON.parse(dataLine) }
   } catch {
     return null
   }
+}
+
+// eslint-disable-next-line @typescript-eslint/no-explicit-any
+function _toIngestionJob(payload: any): AiIngestionJob {
+  return {
+    jobId: payload.job_id,
+    status: payload.status,
+    error: payload.error ?? null,
+    filename: payload.filename ?? "document",
+    chunksTotal: payload.chunks_total ?? null,
+    chunksEmbedded: payload.chunks_embedded ?? 0,
+    etaSeconds: payload.eta_seconds ?? null,
+  }
+}
+
+function _parseSseBlock(block: string): AiSseEvent | null {
+  const fields = _parseSseFields(block)
+  if (!fields) return null
+  const { eventType, payload } = fields
+
+  if (eventType === "guidance") return { type: "guidance", text: payload.text }
+  if (eventType === "suggestion") return { type: "suggestion", ...payload }
+  if (eventType === "queue") {
+    return {
+      type: "queue",
+      position: payload.position,
+      queueDepth: payload.queue_depth,
+      waitedSeconds: payload.waited_seconds,
+    }
+  }
+  if (eventType === "sources") return { type: "sources", sources: payload.sources ?? [] }
+  if (eventType === "superseded") return { type: "superseded" }
+  if (eventType === "done") {
+    return { type: "done", cached: !!payload.cached, retrievalOnly: !!payload.retrieval_only }
+  }
+  if (eventType === "error") return { type: "error", detail: payload.detail }
 
   return null
 }